@@ -1 +1,54 @@
-from .ssm_reader import SSM_Reader
+"""
+Library to parse the ICGC simple somatic mutations file.
+
+The contents of the package are imported on first access, so
+``import ICGC_data_parser`` does not pay for PyVCF (or any other
+module) until it is actually needed.
+"""
+
+import importlib
+
+
+# Public name -> module that defines it
+_EXPORTS = {
+    'SSM_Reader': 'ssm_reader',
+    'ExactCounter': 'sketches',
+    'CountMinSketch': 'sketches',
+    'SpaceSaving': 'sketches',
+    'ExactDistinct': 'sketches',
+    'HyperLogLog': 'sketches',
+    'frequency_counter': 'sketches',
+    'distinct_counter': 'sketches',
+    'top_k_counter': 'sketches',
+    'export_to_sqlite': 'database',
+    'SSM_Database': 'database',
+    'Checkpoint': 'checkpoint',
+    'AsyncSSM_Reader': 'async_reader',
+    'OccurrenceMatrix': 'occurrence_matrix',
+    'ByteLines': 'byte_lines',
+}
+
+# Names that need optional dependencies, left out of
+# ``__all__`` so ``import *`` works without them
+_OPTIONAL = {'OccurrenceMatrix'}
+
+__all__ = [name for name in _EXPORTS if name not in _OPTIONAL]
+
+
+def __getattr__(name):
+    try:
+        module_name = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}') from None
+
+    module = importlib.import_module(f'.{module_name}', __name__)
+    value = getattr(module, name)
+    # Cache it so this is called only once per name
+    globals()[name] = value
+    return value
+# ---
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+# ---
@@ -0,0 +1,211 @@
+"""
+Asynchronous iteration over the ICGC simple somatic mutations
+file, to use the reader from ``asyncio`` code without blocking
+the event loop.
+"""
+
+import asyncio
+import functools
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .ssm_reader import SSM_Reader
+
+
+# Executor shared by the readers that are not given one,
+# created on first use
+_executor = None
+
+
+def get_executor():
+    """The executor used by default for the blocking work.
+
+    It is a thread pool of its own, so long scans don't exhaust the
+    default executor of the event loop, used by other libraries.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(thread_name_prefix='ssm-reader')
+    return _executor
+# ---
+
+
+def _reject_checkpoint(kwargs):
+    """Raise an error if a checkpoint is given for an asynchronous
+    scan. The records are read ahead of the consumer, so a checkpoint
+    saved by ``parse`` may be past records not processed yet.
+    """
+    if kwargs.get('checkpoint') is not None:
+        raise ValueError('Checkpoints are not supported in asynchronous '
+                         'scans, as the records are read ahead of the '
+                         'consumer. Run parse in a thread instead.')
+# ---
+
+
+async def aiter_batches(iterator, executor=None, batch_size=1000,
+                        max_batches=4):
+    """Iterate asynchronously through a blocking iterator.
+
+    The items are fetched in batches of ``batch_size`` in the
+    executor. While the current batch is being consumed the next
+    ones are read ahead, up to ``max_batches`` of them, after that
+    the reading waits for the consumer.
+
+    No thread is held between batches, so many concurrent scans can
+    share a small executor. If the iteration is abandoned (e.g. the
+    task is cancelled), the read ahead stops and closing the iterator
+    waits for the batch being read at that moment, so the blocking
+    iterator is no longer in use after that (``contextlib.aclosing``
+    closes it when the ``async for`` loop is left).
+    """
+    loop = asyncio.get_running_loop()
+    if executor is None:
+        executor = get_executor()
+    queue = asyncio.Queue(max_batches)
+    in_flight = None
+
+    def next_batch():
+        return list(itertools.islice(iterator, batch_size))
+
+    async def read_ahead():
+        nonlocal in_flight
+        try:
+            while True:
+                in_flight = loop.run_in_executor(executor, next_batch)
+                # Shielded, so cancelling the task doesn't
+                # lose track of the batch being read
+                batch = await asyncio.shield(in_flight)
+                await queue.put(batch)
+                if not batch:
+                    # An empty batch marks the end
+                    return
+        except Exception as error:
+            await queue.put(error)
+
+    reader_task = asyncio.ensure_future(read_ahead())
+    try:
+        while True:
+            batch = await queue.get()
+            if isinstance(batch, Exception):
+                raise batch
+            if not batch:
+                return
+            for item in batch:
+                yield item
+    finally:
+        reader_task.cancel()
+        if in_flight is not None:
+            await asyncio.gather(in_flight, return_exceptions=True)
+# ---
+
+
+class AsyncSSM_Reader:
+    """Asynchronous version of ``SSM_Reader``.
+
+    Takes the same arguments as ``SSM_Reader``, plus the options of
+    ``aiter_batches``. Opening the file, reading it and parsing the
+    records is done in the executor.
+
+    Example::
+
+        >>> async def count_mutations(filename, project):
+        ...     async with AsyncSSM_Reader(filename=filename) as reader:
+        ...         n = 0
+        ...         async for record in reader.aparse(filters=[project]):
+        ...             n += 1
+        ...         return n
+
+        >>> n = asyncio.run(count_mutations('data/ssm_sample.vcf', 'BRCA-EU'))
+    """
+
+    def __init__(self, *args, executor=None, batch_size=1000,
+                 max_batches=4, **kwargs):
+        self._open_reader = functools.partial(SSM_Reader, *args, **kwargs)
+        self.executor = executor or get_executor()
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.reader = None
+        # Held while reading the file, so it
+        # is not closed in the middle of a read
+        self._lock = threading.Lock()
+    # ---
+
+    async def _run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+    # ---
+
+    async def open(self):
+        """Open the file and parse the header."""
+        if self.reader is None:
+            self.reader = await self._run(self._open_reader)
+        return self
+    # ---
+
+    async def close(self):
+        """Close the file, once the record being read (if any) is
+        done. Scans still running get an error on their next read.
+        """
+        if self.reader is not None:
+            reader, self.reader = self.reader, None
+            await self._run(self._close_file, reader)
+    # ---
+
+    def _close_file(self, reader):
+        with self._lock:
+            reader._reader.close()
+    # ---
+
+    def _locked(self, records):
+        """Iterate through the records holding the lock for each read."""
+        lock = self._lock
+        while True:
+            with lock:
+                record = next(records, None)
+            if record is None:
+                return
+            yield record
+    # ---
+
+    async def __aenter__(self):
+        return await self.open()
+    # ---
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    # ---
+
+    @property
+    def infos(self):
+        """The INFO fields from the header."""
+        return self.reader.infos
+    # ---
+
+    def subfield_parser(self, sf_name, sep='|'):
+        """Same as ``SSM_Reader.subfield_parser``."""
+        return self.reader.subfield_parser(sf_name, sep=sep)
+    # ---
+
+    async def aparse(self, filters=None, **kwargs):
+        """Asynchronous version of ``SSM_Reader.parse``, takes the
+        same arguments except ``checkpoint``.
+        """
+        _reject_checkpoint(kwargs)
+        await self.open()
+        records = aiter_batches(self._locked(self.reader.parse(filters=filters,
+                                                               **kwargs)),
+                                executor=self.executor,
+                                batch_size=self.batch_size,
+                                max_batches=self.max_batches)
+        try:
+            async for record in records:
+                yield record
+        finally:
+            await records.aclose()
+    # ---
+
+    def __aiter__(self):
+        return self.aparse()
+    # ---
+# --- AsyncSSM_Reader
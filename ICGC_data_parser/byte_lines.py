@@ -0,0 +1,286 @@
+"""
+Fast reading of the lines of a VCF file as bytes.
+
+Instead of decoding every line into a string, the file is read in
+large blocks (the whole file is memory-mapped if it is not
+compressed) and the lines are located inside the blocks. Filters
+are searched directly in the block and only the columns requested
+are copied out, so scans that look at a few columns of the lines
+don't pay for the rest of them.
+
+Example::
+
+    >>> lines = ByteLines('data/ssm_sample.vcf')
+
+    >>> for chrom, pos in lines.columns([0, 1], filters=[b'BRCA-EU']):
+    ...    print(chrom, pos)
+"""
+
+import gzip
+import mmap
+import os
+import re
+
+
+# Regular expression constructs that don't behave as in a line when
+# searching in a block (\A, \Z and lookbehinds). A pattern with them
+# is searched in each line, more slowly.
+LINE_ONLY_PATTERN = re.compile(rb'\\[AZ]|\(\?<[=!]')
+
+
+class ByteLines:
+    """The lines of a VCF file, read as bytes.
+
+    Reading starts at the position ``start`` of the (uncompressed)
+    file. By default, that is the first line after the header.
+    Gzipped files are detected by their extension, or can be forced
+    with ``compressed=True``.
+    """
+    def __init__(self, filename, start=None, compressed=None,
+                 block_size=1 << 22):
+        self.filename = filename
+        self.compressed = (filename.endswith('.gz')
+                           if compressed is None
+                           else compressed)
+        self.start = start
+        self.block_size = block_size
+    # ---
+
+    def _open(self):
+        if self.compressed:
+            return gzip.open(self.filename, 'rb')
+        return open(self.filename, 'rb')
+    # ---
+
+    def _data_start(self):
+        """Position of the first line after the header."""
+        position = 0
+        with self._open() as file:
+            for line in file:
+                if not line.startswith(b'#'):
+                    break
+                position += len(line)
+        return position
+    # ---
+
+    def blocks(self):
+        """Iterate through the data as ``(buffer, start, end)`` tuples,
+        the lines are in ``buffer[start:end]``, complete.
+
+        Uncompressed files are memory-mapped and given in a single
+        block, compressed ones are decompressed ``block_size`` bytes
+        at a time.
+        """
+        start = self.start if self.start is not None else self._data_start()
+
+        if not self.compressed:
+            with open(self.filename, 'rb') as file:
+                if os.fstat(file.fileno()).st_size <= start:
+                    return
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    yield buffer, start, len(buffer)
+            return
+
+        with gzip.open(self.filename, 'rb') as file:
+            file.seek(start)
+            tail = b''
+            while True:
+                chunk = file.read(self.block_size)
+                if not chunk:
+                    if tail:
+                        yield tail, 0, len(tail)
+                    return
+                data = tail + chunk
+                # Give only complete lines, the rest
+                # goes at the start of the next block
+                cut = data.rfind(b'\n') + 1
+                if cut:
+                    yield data, 0, cut
+                tail = data[cut:]
+    # ---
+
+    def spans(self, filters=None):
+        """Iterate through the lines as ``(buffer, start, end)`` tuples,
+        the line (without the newline) is in ``buffer[start:end]``.
+
+        Only the lines where all the ``filters`` (regular expressions,
+        as bytes or ASCII strings) are found are given. The first filter
+        is searched through the whole block, jumping directly to the
+        lines that match it, without visiting (or copying) the rest.
+        Filters with ``\\A``, ``\\Z`` or lookbehinds are searched in a
+        copy of each line instead, so they give the same lines as in
+        ``SSM_Reader.iter_lines``.
+        """
+        # In multiline mode ^ and $ match at the start
+        # and end of each line, as when searching a line
+        patterns = [re.compile(regex.encode('ascii')
+                                   if isinstance(regex, str)
+                                   else regex,
+                               re.MULTILINE)
+                        for regex in (filters or [])
+                        if regex is not None]
+
+        # \A, \Z and lookbehinds see past the line when searching in
+        # the block, those patterns are searched in a copy of the line
+        line_patterns = [pattern for pattern in patterns
+                         if LINE_ONLY_PATTERN.search(pattern.pattern)]
+        patterns = [pattern for pattern in patterns
+                    if pattern not in line_patterns]
+
+        if not patterns:
+            spans = self._all_spans()
+        elif patterns[0].pattern.startswith(b'^'):
+            # Searching for ^ tries at every position of the block,
+            # search for the newline before the line instead
+            spans = self._anchored_spans(patterns[0], patterns[1:])
+        else:
+            spans = self._searched_spans(patterns[0], patterns[1:])
+
+        if not line_patterns:
+            yield from spans
+            return
+        for buffer, start, end in spans:
+            line = buffer[start:end]
+            if all(pattern.search(line) for pattern in line_patterns):
+                yield buffer, start, end
+    # ---
+
+    def _searched_spans(self, first, other_patterns):
+        """Same as ``spans``, searching the first pattern in the
+        whole block.
+        """
+        search = first.search
+        for buffer, position, end in self.blocks():
+            find, rfind = buffer.find, buffer.rfind
+            while position < end:
+                match = search(buffer, position, end)
+                if match is None:
+                    break
+
+                # Find the line of the match
+                line_start = rfind(b'\n', position, match.start()) + 1
+                line_start = max(line_start, position)
+                line_end = find(b'\n', match.start(), end)
+                if line_end < 0:
+                    line_end = end
+
+                if match.end() > line_end:
+                    # The match spans several lines, look
+                    # for one inside this line only
+                    found = search(buffer, line_start, line_end) is not None
+                else:
+                    found = True
+                if found and line_end > line_start and all(
+                        pattern.search(buffer, line_start, line_end)
+                            for pattern in other_patterns):
+                    yield buffer, line_start, line_end
+                position = line_end + 1
+    # ---
+
+    def _all_spans(self):
+        """Same as ``spans``, without filters."""
+        for buffer, position, end in self.blocks():
+            find = buffer.find
+            while position < end:
+                line_end = find(b'\n', position, end)
+                if line_end < 0:
+                    # Last line of the file, without newline
+                    line_end = end
+                if line_end > position:
+                    yield buffer, position, line_end
+                position = line_end + 1
+    # ---
+
+    def _anchored_spans(self, first, other_patterns):
+        """Same as ``spans``, for a first pattern starting with ^.
+
+        The block is searched for the pattern with a newline in place
+        of the ^, which has a fast literal prefix. The lines found are
+        then checked with the pattern itself. The first line of each
+        block, without a newline before it, is checked apart.
+        """
+        search = re.compile(b'\n' + first.pattern[1:], re.MULTILINE).search
+        patterns = [first] + other_patterns
+
+        for buffer, position, end in self.blocks():
+            find, rfind = buffer.find, buffer.rfind
+            # Each line is looked for from the newline before it
+            line_end = position - 1
+            while True:
+                line_start = line_end + 1
+                line_end = find(b'\n', line_start, end)
+                if line_end < 0:
+                    line_end = end
+                if line_end > line_start and all(
+                        pattern.search(buffer, line_start, line_end)
+                            for pattern in patterns):
+                    yield buffer, line_start, line_end
+                if line_end >= end:
+                    break
+
+                match = search(buffer, line_end, end)
+                if match is None:
+                    break
+                # The line before the one of the match (the one
+                # after the newline if the match starts at one)
+                line_end = rfind(b'\n', line_end, match.start() + 1)
+    # ---
+
+    def __iter__(self):
+        return self.lines()
+    # ---
+
+    def lines(self, filters=None):
+        """Iterate through the lines (as bytes, without the newline)
+        where all the ``filters`` are found.
+        """
+        for buffer, start, end in self.spans(filters):
+            yield buffer[start:end]
+    # ---
+
+    def columns(self, indexes, filters=None):
+        """Iterate through the given columns (a list of indexes) of the
+        lines where all the ``filters`` are found. Gives a tuple with
+        the columns (as bytes) for each line.
+
+        The columns are located with a regular expression that reads
+        only up to the last column requested, and only the columns
+        requested are copied. Lines with less columns are skipped.
+        """
+        indexes = list(indexes)
+        if not indexes:
+            raise ValueError('At least one column index is needed.')
+        if min(indexes) < 0:
+            raise ValueError('The column indexes must be non-negative.')
+        return self._columns(indexes, filters)
+    # ---
+
+    def _columns(self, indexes, filters):
+        last = max(indexes)
+        # (skipping empty lines, as the lookahead requires a character,
+        # and consuming the rest of the line, so the search for the
+        # next one doesn't try to match at each character)
+        columns = re.compile(rb'^(?=[^\n])'
+                             + rb'([^\t\n]*)\t' * last
+                             + rb'([^\t\n]*)[^\n]*',
+                             re.MULTILINE)
+        groups = [index + 1 for index in indexes]
+
+        if not filters:
+            # Scan all the lines of each block at once
+            for buffer, start, end in self.blocks():
+                for match in columns.finditer(buffer, start, end):
+                    yield tuple(map(match.group, groups))
+            return
+
+        for buffer, start, end in self.spans(filters):
+            match = columns.match(buffer, start, end)
+            if match is not None:
+                yield tuple(map(match.group, groups))
+    # ---
+
+    def count(self, filters=None):
+        """Number of lines where all the ``filters`` are found."""
+        return sum(1 for _ in self.spans(filters))
+    # ---
+# --- ByteLines
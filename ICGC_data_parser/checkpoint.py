@@ -0,0 +1,82 @@
+"""
+Checkpoints to resume long scans of the ICGC simple somatic
+mutations file.
+"""
+
+import os
+import pickle
+
+
+class Checkpoint:
+    """State of a scan, periodically saved to a file so the scan
+    can be resumed from there if it is interrupted.
+
+    The state consists of the position in the (uncompressed) file,
+    hashes of the header and first data line of the file, which must
+    match to resume the scan, the size of the quarantine file, whether the scan was finished
+    and the contents of the given aggregators (see
+    ``ICGC_data_parser.sketches``). It is saved every ``every``
+    lines read. When a scan resumes, the saved contents are merged
+    into the aggregators, so they should be empty at that point.
+
+    Example::
+
+        >>> reader = SSM_Reader(filename='data/ssm_sample.vcf')
+        >>> recurrence = ExactCounter()
+        >>> checkpoint = Checkpoint('scan.ckpt', every=100000,
+        ...                         aggregators=[recurrence])
+
+        # If interrupted, running this again continues
+        # from the last checkpoint saved
+        >>> for record in reader.parse(checkpoint=checkpoint,
+        ...                            quarantine='bad_lines.tsv'):
+        ...     recurrence.add(record.INFO['affected_donors'])
+    """
+
+    def __init__(self, path, every=100000, aggregators=()):
+        self.path = path
+        self.every = every
+        self.aggregators = list(aggregators)
+    # ---
+
+    def load(self):
+        """The state saved, or None if there is none."""
+        try:
+            with open(self.path, 'rb') as file:
+                return pickle.load(file)
+        except FileNotFoundError:
+            return None
+    # ---
+
+    def save(self, **state):
+        """Save the state given along with the aggregators."""
+        state['aggregators'] = self.aggregators
+
+        # Write to a temporary file first, so an interruption
+        # while saving doesn't destroy the previous checkpoint
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+    # ---
+
+    def restore(self, state):
+        """Merge the saved aggregators into the current ones."""
+        saved = state['aggregators']
+        if len(saved) != len(self.aggregators):
+            raise ValueError(f'The checkpoint holds {len(saved)} aggregators, '
+                             f'but {len(self.aggregators)} were given.')
+        for aggregator, saved_aggregator in zip(self.aggregators, saved):
+            aggregator.merge(saved_aggregator)
+    # ---
+
+    def clear(self):
+        """Remove the saved state, the next scan starts anew."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+    # ---
+# --- Checkpoint
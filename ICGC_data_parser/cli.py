@@ -0,0 +1,452 @@
+"""
+The ``icgc`` command line program.
+
+``icgc run`` does in a single pass over a VCF file what otherwise
+takes a chain of the ``vcf_sample.py``, ``vcf_map_assembly.py``
+and ``vcf_split.py`` scripts, without intermediate files::
+
+    $ icgc run -i simple_somatic_mutation.aggregated.vcf.gz \\
+               --filter project=BRCA-EU --sample 0.1 \\
+               --liftover GRCh37:GRCh38 --split-by chrom -o brca_
+
+The lines flow between the stages in blocks and, with ``--jobs``,
+the filtering and mapping of the blocks runs in a pool of worker
+processes.
+"""
+
+import click
+import gzip
+import importlib.util
+import random
+import re
+import sys
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Fields that can be used in the filters: name -> column index
+# or (INFO subfield, subfield item)
+FILTER_FIELDS = {
+    'chrom': 0,
+    'id': 2,
+    'project': ('OCCURRENCE', 'project_code'),
+    'gene': ('CONSEQUENCE', 'gene_symbol'),
+    'consequence': ('CONSEQUENCE', 'consequence_type'),
+}
+
+SUBFIELDS_PATTERN = re.compile(r'\(subfields: (.*?)\)')
+
+
+def read_header(lines):
+    """Read the header lines, returns them
+    and the first line after them.
+    """
+    header = []
+    for line in lines:
+        if not line.startswith('#'):
+            return header, line
+        header.append(line)
+    return header, None
+# ---
+
+
+def subfield_names(header, field_id):
+    """Names of the subfields of the INFO field, as
+    described in the header.
+    """
+    for line in header:
+        if line.startswith(f'##INFO=<ID={field_id},'):
+            return SUBFIELDS_PATTERN.search(line).group(1).split('|')
+    raise click.BadParameter(f'The header has no {field_id} INFO field.')
+# ---
+
+
+def read_blocks(lines, first_line, block_size):
+    """Group the lines in lists of ``block_size`` lines."""
+    block = [first_line] if first_line is not None else []
+    for line in lines:
+        block.append(line)
+        if len(block) >= block_size:
+            yield block
+            block = []
+    if block:
+        yield block
+# ---
+
+
+class ColumnEquals:
+    """Condition on the value of a column of the line."""
+    def __init__(self, index, value):
+        self.index = index
+        self.value = value
+    # ---
+
+    def __call__(self, line):
+        return line.split('\t', self.index + 1)[self.index] == self.value
+    # ---
+# --- ColumnEquals
+
+
+class SubfieldEquals:
+    """Condition on an item of the list-like INFO subfields
+    (as CONSEQUENCE or OCCURRENCE), at least one of the entries
+    must have the given value.
+    """
+    def __init__(self, field_id, position, value):
+        self.pattern = re.compile(rf'(?:\t|;){field_id}=([^;\s]*)')
+        self.position = position
+        self.value = value
+    # ---
+
+    def __call__(self, line):
+        match = self.pattern.search(line)
+        if match is None:
+            return False
+        position, value = self.position, self.value
+        return any(item.split('|')[position:position+1] == [value]
+                       for item in match.group(1).split(','))
+    # ---
+# --- SubfieldEquals
+
+
+class RegexSearch:
+    """Condition on the line matching a regular expression."""
+    def __init__(self, regex):
+        self.pattern = re.compile(regex)
+    # ---
+
+    def __call__(self, line):
+        return self.pattern.search(line) is not None
+    # ---
+# --- RegexSearch
+
+
+def make_condition(spec, header):
+    """Create the condition from a ``FIELD=VALUE`` specification,
+    anything else is taken as a regular expression.
+    """
+    field, sep, value = spec.partition('=')
+    if not sep or field not in FILTER_FIELDS:
+        return RegexSearch(spec)
+
+    where = FILTER_FIELDS[field]
+    if isinstance(where, int):
+        return ColumnEquals(where, value)
+
+    field_id, subfield = where
+    position = subfield_names(header, field_id).index(subfield)
+    return SubfieldEquals(field_id, position, value)
+# ---
+
+
+class Filter:
+    """Stage that keeps the lines that meet all the conditions."""
+    def __init__(self, conditions):
+        self.conditions = conditions
+    # ---
+
+    def __call__(self, block):
+        conditions = self.conditions
+        return [line for line in block
+                    if all(condition(line) for condition in conditions)]
+    # ---
+# --- Filter
+
+
+class Sample:
+    """Stage that keeps a random fraction of the lines."""
+    def __init__(self, fraction, seed=None):
+        self.fraction = fraction
+        self.random = random.Random(seed).random
+    # ---
+
+    def __call__(self, block):
+        fraction, random_ = self.fraction, self.random
+        return [line for line in block if random_() < fraction]
+    # ---
+# --- Sample
+
+
+class Liftover:
+    """Stage that maps the positions to another genome assembly.
+
+    Lines whose position can't be mapped are dropped.
+    """
+    def __init__(self, from_assembly, to_assembly):
+        self.from_assembly = from_assembly
+        self.to_assembly = to_assembly
+        self.mapper = None
+    # ---
+
+    def __getstate__(self):
+        # The mapper is not sent to the worker processes, each
+        # one builds its own on first use (the stages are sent
+        # once per worker, see map_blocks)
+        state = self.__dict__.copy()
+        state['mapper'] = None
+        return state
+    # ---
+
+    def header(self, header):
+        """Update the reference assembly in the header."""
+        reference = f'##reference={self.to_assembly}\n'
+        header = [reference if line.startswith('##reference=') else line
+                      for line in header]
+        if reference not in header:
+            header.insert(len(header) - 1, reference)
+        return header
+    # ---
+
+    def __call__(self, block):
+        if self.mapper is None:
+            from ensembl_rest import AssemblyMapper
+            self.mapper = AssemblyMapper(from_assembly=self.from_assembly,
+                                         to_assembly=self.to_assembly)
+        mapped = []
+        for line in block:
+            chrom, pos, rest = line.split('\t', 2)
+            new_pos = self.mapper.map(chrom, int(pos))
+            if new_pos is not None:
+                mapped.append(f'{chrom}\t{new_pos}\t{rest}')
+        return mapped
+    # ---
+# --- Liftover
+
+
+class Chain:
+    """Apply several stages one after the other."""
+    def __init__(self, stages):
+        self.stages = stages
+    # ---
+
+    def __call__(self, block):
+        for stage in self.stages:
+            block = stage(block)
+        return block
+    # ---
+# --- Chain
+
+
+# Function applied to the blocks by a worker process
+_worker_function = None
+
+
+def _init_worker(function):
+    global _worker_function
+    _worker_function = function
+# ---
+
+
+def _apply_worker_function(block):
+    return _worker_function(block)
+# ---
+
+
+def map_blocks(function, blocks, jobs=1):
+    """Apply the function to each block, in order.
+
+    With more than one job, the blocks are processed by a pool of
+    worker processes. The function is sent once to each worker,
+    so any state it builds (e.g. the liftover mapper) is kept
+    between blocks. At most ``2 * jobs`` blocks are in flight at
+    any time, so the memory used stays bounded even if the input
+    is read faster than it is processed.
+    """
+    if jobs <= 1:
+        yield from map(function, blocks)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs,
+                             initializer=_init_worker,
+                             initargs=(function,)) as pool:
+        pending = deque()
+        for block in blocks:
+            pending.append(pool.submit(_apply_worker_function, block))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+# ---
+
+
+def write_output(blocks, header, output):
+    """Write all the lines to the output file."""
+    output.writelines(header)
+    for block in blocks:
+        output.writelines(block)
+# ---
+
+
+def write_split_by_chrom(blocks, header, basename):
+    """Write the lines of each chromosome to a different file."""
+    files = {}
+    try:
+        for block in blocks:
+            for line in block:
+                chrom = line.split('\t', 1)[0]
+                outfile = files.get(chrom)
+                if outfile is None:
+                    outfile = files[chrom] = open(f'{basename}{chrom}.vcf', 'w')
+                    outfile.writelines(header)
+                outfile.write(line)
+    finally:
+        for outfile in files.values():
+            outfile.close()
+# ---
+
+
+def write_split_by_lines(blocks, header, basename, lines):
+    """Write the lines to files of ``lines`` lines each."""
+    outfile, files_count, lines_in_file = None, 0, 0
+    try:
+        for block in blocks:
+            for line in block:
+                if outfile is None or lines_in_file >= lines:
+                    if outfile is not None:
+                        outfile.close()
+                    files_count += 1
+                    outfile = open(f'{basename}{files_count}.vcf', 'w')
+                    outfile.writelines(header)
+                    lines_in_file = 0
+                outfile.write(line)
+                lines_in_file += 1
+    finally:
+        if outfile is not None:
+            outfile.close()
+# ---
+
+
+def open_input(filename):
+    """Open the input file, stdin if no filename is given (it
+    is not closed at the end of the ``with`` block).
+    """
+    if filename is None or filename == '-':
+        return nullcontext(sys.stdin)
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt')
+    return open(filename)
+# ---
+
+
+def validate_percentage(ctx, param, value):
+    if value is None or 0 <= value <= 1:
+        return value
+    else:
+        raise click.BadParameter('Percentage should be btw 0 and 1.')
+# ---
+
+
+def validate_assemblies(ctx, param, value):
+    if value is None:
+        return value
+    assemblies = value.split(':')
+    if len(assemblies) != 2:
+        raise click.BadParameter('Should be FROM:TO, e.g. GRCh37:GRCh38.')
+    if importlib.util.find_spec('ensembl_rest') is None:
+        raise click.BadParameter('The ensembl_rest package is needed.')
+    return assemblies
+# ---
+
+
+# Command line interface
+@click.group()
+def main():
+    """Tools to manipulate the ICGC simple somatic mutations file."""
+# ---
+
+
+@main.command()
+
+@click.option('--input', '-i',
+              help='VCF file to read from (may be gzipped), stdin by default.')
+
+@click.option('--output', '-o',
+              help='VCF file to write output, or the base name of the '
+                   'parts if splitting.')
+
+@click.option('--filter', 'filters',
+              multiple=True,
+              help='Keep only the lines with FIELD=VALUE, where FIELD is one '
+                   f'of {", ".join(FILTER_FIELDS)}. Any other value is taken '
+                   'as a regular expression. May be given several times.')
+
+@click.option('--sample', '-p',
+              type=float,
+              callback=validate_percentage,
+              help='Fraction of lines to keep (a number btw 0 and 1).')
+
+@click.option('--seed',
+              type=int,
+              help='Seed for the random sampling.')
+
+@click.option('--liftover',
+              callback=validate_assemblies,
+              help='Map the positions between assemblies, as FROM:TO '
+                   '(e.g. GRCh37:GRCh38).')
+
+@click.option('--split-by',
+              type=click.Choice(['chrom']),
+              help='Write a file for each value of the field.')
+
+@click.option('--split-lines', '-l',
+              type=click.IntRange(min=1),
+              help='Write files with this number of lines each.')
+
+@click.option('--block-size',
+              type=click.IntRange(min=1),
+              default=10000,
+              show_default=True,
+              help='Lines passed at once between the stages.')
+
+@click.option('--jobs', '-j',
+              type=click.IntRange(min=1),
+              default=1,
+              show_default=True,
+              help='Worker processes for the filtering and mapping.')
+
+def run(input, output, filters, sample, seed, liftover,
+        split_by, split_lines, block_size, jobs):
+    """Filter, sample, map and split a VCF file in a single pass.
+
+    The stages run in the order sample, filter, liftover and the
+    result is written to the output or split in several files.
+    Sampling goes first, as it gives the same result either way
+    and the next stages have less lines to process.
+    """
+    if split_by and split_lines:
+        raise click.UsageError('Use either --split-by or --split-lines.')
+
+    with open_input(input) as input_file:
+        header, first_line = read_header(input_file)
+        blocks = read_blocks(input_file, first_line, block_size)
+
+        if sample is not None:
+            blocks = map(Sample(sample, seed), blocks)
+
+        stages = []
+        if filters:
+            stages.append(Filter([make_condition(spec, header)
+                                      for spec in filters]))
+        if liftover:
+            stage = Liftover(*liftover)
+            header = stage.header(header)
+            stages.append(stage)
+        if stages:
+            blocks = map_blocks(Chain(stages), blocks, jobs=jobs)
+
+        if split_by == 'chrom':
+            write_split_by_chrom(blocks, header, output or 'out')
+        elif split_lines:
+            write_split_by_lines(blocks, header, output or 'out', split_lines)
+        elif output:
+            with open(output, 'w') as outfile:
+                write_output(blocks, header, outfile)
+        else:
+            write_output(blocks, header, sys.stdout)
+# ---
+
+
+if __name__ == '__main__':
+    # Command line interface
+    main()
@@ -0,0 +1,279 @@
+"""
+Export of the ICGC simple somatic mutations file to a local
+SQLite database, and a thin query layer over it.
+
+The database holds three tables:
+
+- ``mutations``: One row per line of the file, with the main
+  columns, the scalar INFO subfields and the raw line.
+- ``consequences``: One row per item of the CONSEQUENCE subfield.
+- ``occurrences``: One row per item of the OCCURRENCE subfield.
+
+The last two are linked to the first by the ``mutation_id`` column.
+
+Example::
+
+    >>> reader = SSM_Reader(filename='data/ssm_sample.vcf')
+    >>> export_to_sqlite(reader, 'ssm.db')
+
+    >>> db = SSM_Database('ssm.db')
+    >>> for record in db.by_gene('TP53', project='BRCA-EU'):
+    ...     print(record.ID, record.CHROM, record.POS)
+
+    # Which projects share this mutation?
+    >>> db.execute('SELECT project_code FROM occurrences '
+    ...            'WHERE mutation_id = ?', [record.ID]).fetchall()
+"""
+
+import io
+import sqlite3
+
+from .ssm_reader import SSM_Reader
+
+
+# Scalar INFO subfields stored as columns of the mutations table
+MUTATION_INFO_COLUMNS = ['affected_donors', 'tested_donors',
+                         'project_count', 'mutation']
+
+# Column types of the subfields that are not text
+COLUMN_TYPES = {
+    'pos': 'INTEGER',
+    'affected_donors': 'INTEGER',
+    'tested_donors': 'INTEGER',
+    'project_count': 'INTEGER',
+    'frequency': 'REAL',
+}
+
+INDEXES = [
+    ('mutations', ['id']),
+    ('mutations', ['chrom', 'pos']),
+    ('consequences', ['mutation_id']),
+    ('consequences', ['gene_symbol']),
+    ('occurrences', ['mutation_id']),
+    ('occurrences', ['project_code']),
+]
+
+
+def _column_defs(columns):
+    return ', '.join(f'{column} {COLUMN_TYPES.get(column, "TEXT")}'
+                         for column in columns)
+# ---
+
+
+def _header_text(reader):
+    """Reconstruct the header lines of the file read."""
+    columns_line = '#' + '\t'.join(reader._column_headers + reader.samples)
+    return '\n'.join(reader._header_lines + [columns_line])
+# ---
+
+
+def export_to_sqlite(reader, path, filters=None, batch_size=50000):
+    """Bulk load the mutations of the reader into an SQLite database.
+
+    Rows are inserted with ``executemany`` in batches of
+    ``batch_size`` mutations, all the load happens in a single
+    transaction and the indexes are created only after it. The
+    database is left in WAL mode, so it can be queried while
+    being written.
+
+    The ``filters`` are regular expressions, as in ``SSM_Reader.parse``.
+    Empty subfield values are stored as NULL.
+    """
+    consequence_fields = reader.subfield_parser('CONSEQUENCE').subfields
+    occurrence_fields = reader.subfield_parser('OCCURRENCE').subfields
+    mutation_fields = (['chrom', 'pos', 'id', 'ref', 'alt']
+                       + MUTATION_INFO_COLUMNS
+                       + ['line'])
+
+    connection = sqlite3.connect(path, isolation_level=None)
+    try:
+        connection.execute('PRAGMA journal_mode = WAL')
+        # The load is redone from scratch if it fails,
+        # so trade safety for speed while it runs
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.execute('PRAGMA temp_store = MEMORY')
+        connection.execute('PRAGMA cache_size = -262144')
+
+        connection.execute('BEGIN')
+        for table in ('meta', 'mutations', 'consequences', 'occurrences'):
+            connection.execute(f'DROP TABLE IF EXISTS {table}')
+        connection.execute('CREATE TABLE meta '
+                           '(key TEXT PRIMARY KEY, value TEXT)')
+        connection.execute(f'CREATE TABLE mutations '
+                           f'({_column_defs(mutation_fields)})')
+        consequence_defs = _column_defs(['mutation_id'] + consequence_fields)
+        occurrence_defs = _column_defs(['mutation_id'] + occurrence_fields)
+        connection.execute(f'CREATE TABLE consequences ({consequence_defs})')
+        connection.execute(f'CREATE TABLE occurrences ({occurrence_defs})')
+        connection.execute('INSERT INTO meta VALUES (?, ?)',
+                           ['header', _header_text(reader)])
+
+        def placeholders(n):
+            return ', '.join('?' * n)
+
+        insert_mutations = (f'INSERT INTO mutations VALUES '
+                            f'({placeholders(len(mutation_fields))})')
+        n_consequence_fields = len(consequence_fields)
+        n_occurrence_fields = len(occurrence_fields)
+        insert_consequences = (f'INSERT INTO consequences VALUES '
+                               f'({placeholders(n_consequence_fields + 1)})')
+        insert_occurrences = (f'INSERT INTO occurrences VALUES '
+                              f'({placeholders(n_occurrence_fields + 1)})')
+
+        def flush():
+            connection.executemany(insert_mutations, mutations)
+            connection.executemany(insert_consequences, consequences)
+            connection.executemany(insert_occurrences, occurrences)
+            mutations.clear()
+            consequences.clear()
+            occurrences.clear()
+
+        mutations, consequences, occurrences = [], [], []
+        for line in reader.iter_lines(filters=filters):
+            # Parse only the parts that are stored, the whole
+            # record is reconstructed from the line when queried
+            fields = line.split('\t')
+            if len(fields) < 8:
+                # Malformed line
+                continue
+            chrom, pos, mutation_id, ref, alt, _, _, info_str = fields[:8]
+            info = dict(entry.partition('=')[::2]
+                            for entry in info_str.split(';'))
+
+            mutations.append([chrom, pos, mutation_id, ref, alt]
+                             + [info.get(column)
+                                    for column in MUTATION_INFO_COLUMNS]
+                             + [line])
+            for item in info.get('CONSEQUENCE', '').split(','):
+                if item:
+                    values = item.split('|')[:n_consequence_fields]
+                    consequences.append([mutation_id]
+                                        + [v or None for v in values])
+            for item in info.get('OCCURRENCE', '').split(','):
+                if item:
+                    values = item.split('|')[:n_occurrence_fields]
+                    occurrences.append([mutation_id]
+                                       + [v or None for v in values])
+
+            if len(mutations) >= batch_size:
+                flush()
+        flush()
+
+        # Indexes are cheaper to build once all the data is there
+        table_fields = {
+            'mutations': mutation_fields,
+            'consequences': ['mutation_id'] + consequence_fields,
+            'occurrences': ['mutation_id'] + occurrence_fields,
+        }
+        for table, columns in INDEXES:
+            if not set(columns) <= set(table_fields[table]):
+                # The header lacks the subfield
+                continue
+            connection.execute(f'CREATE INDEX {table}_{"_".join(columns)} '
+                               f'ON {table} ({", ".join(columns)})')
+        connection.execute('COMMIT')
+        connection.execute('ANALYZE')
+    except BaseException:
+        # Leave the database as it was before the load
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')
+        raise
+    finally:
+        connection.close()
+# ---
+
+
+class SSM_Database:
+    """Query layer over a database created with ``export_to_sqlite``.
+
+    The query methods yield the same records ``SSM_Reader.parse``
+    does. For anything else, ``execute`` runs arbitrary SQL.
+
+    Example::
+
+        >>> db = SSM_Database('ssm.db')
+
+        >>> for record in db.by_project('BRCA-EU'):
+        ...    print(record.ID, record.CHROM, record.POS)
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        header, = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'header'"
+        ).fetchone()
+
+        # The records are parsed by a reader
+        # of the original header and no data
+        self.parser = SSM_Reader(fsock=io.StringIO(header + '\n'))
+    # ---
+
+    @property
+    def infos(self):
+        """The INFO fields from the header of the original file."""
+        return self.parser.infos
+    # ---
+
+    def subfield_parser(self, sf_name, sep='|'):
+        """Same as ``SSM_Reader.subfield_parser``."""
+        return self.parser.subfield_parser(sf_name, sep=sep)
+    # ---
+
+    def execute(self, sql, parameters=()):
+        """Run an SQL statement, returns the cursor."""
+        return self.connection.execute(sql, parameters)
+    # ---
+
+    def records(self, where='1', parameters=()):
+        """Iterate through the records of the mutations matching
+        the SQL condition given, in file order.
+        """
+        cursor = self.connection.execute(
+            f'SELECT line FROM mutations WHERE {where} ORDER BY rowid',
+            parameters
+        )
+        for line, in cursor:
+            self.parser.push_line(line)
+            yield next(self.parser)
+    # ---
+
+    def by_id(self, mutation_id):
+        """The record of the mutation with the given ID, or None."""
+        return next(self.records('id = ?', [mutation_id]), None)
+    # ---
+
+    def in_region(self, chrom, start, end):
+        """Records of the mutations in ``chrom`` with
+        ``start <= POS <= end``.
+        """
+        return self.records('chrom = ? AND pos BETWEEN ? AND ?',
+                            [str(chrom), start, end])
+    # ---
+
+    def by_project(self, project_code):
+        """Records of the mutations that occur in the project."""
+        return self.records(
+            'id IN (SELECT mutation_id FROM occurrences '
+            '       WHERE project_code = ?)',
+            [project_code]
+        )
+    # ---
+
+    def by_gene(self, gene_symbol, project=None):
+        """Records of the mutations with a consequence on the
+        gene, optionally only those that occur in the project.
+        """
+        where = ('id IN (SELECT mutation_id FROM consequences '
+                 '       WHERE gene_symbol = ?)')
+        parameters = [gene_symbol]
+        if project is not None:
+            where += (' AND id IN (SELECT mutation_id FROM occurrences '
+                      '            WHERE project_code = ?)')
+            parameters.append(project)
+        return self.records(where, parameters)
+    # ---
+
+    def close(self):
+        self.connection.close()
+    # ---
+# --- SSM_Database
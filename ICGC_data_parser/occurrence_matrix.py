@@ -0,0 +1,251 @@
+"""
+Sparse matrices of the donor counts in the OCCURRENCE subfield
+of the ICGC simple somatic mutations file.
+
+Requires NumPy (and SciPy for ``OccurrenceMatrix.to_scipy``).
+
+Example::
+
+    >>> reader = SSM_Reader(filename='data/ssm_sample.vcf')
+    >>> matrix = OccurrenceMatrix.from_reader(reader)
+    >>> matrix.save('occurrences.npz')
+
+    # How many mutations affect 1, 2, 3... donors?
+    >>> recurrence = matrix.recurrence_distribution()
+
+    # Donors affected per gene in each project
+    >>> counts = matrix.gene_project_counts()
+"""
+
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+
+# Sparse gene x project matrix in COO format: the arrays
+# ``gene_index``, ``project_index``, ``affected_donors`` and
+# ``mutations`` hold one entry for each pair with mutations
+GeneProjectCounts = namedtuple('GeneProjectCounts',
+                               ['genes', 'projects',
+                                'gene_index', 'project_index',
+                                'affected_donors', 'mutations'])
+
+
+def _expand_ranges(indptr, rows):
+    """Positions of the entries of the given rows of a CSR matrix,
+    concatenated, and the number of entries of each row.
+    """
+    lengths = np.diff(indptr)[rows]
+    starts = np.repeat(indptr[rows], lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths,
+                                                   lengths)
+    return starts + offsets, lengths
+# ---
+
+
+class OccurrenceMatrix:
+    """Sparse mutation x project matrix of donor counts, in CSR format.
+
+    The entries of the mutation ``i`` are at positions
+    ``indptr[i]:indptr[i+1]`` of the arrays ``indices`` (the project
+    index, see ``projects``), ``affected`` and ``tested`` (the
+    affected and tested donors). The genes with a consequence of each
+    mutation are stored likewise in ``gene_indptr`` and
+    ``gene_indices`` (indexes of ``genes``).
+
+    The mutation IDs are stored as fixed width bytes (NumPy ``S``
+    dtype) in ``mutation_ids``.
+
+    The matrix is built in one pass over the file with ``from_reader``
+    and can be stored and loaded with ``save`` and ``load``.
+    """
+
+    ARRAYS = ('indptr', 'indices', 'affected', 'tested',
+              'gene_indptr', 'gene_indices')
+
+    def __init__(self, mutation_ids, projects, genes, indptr, indices,
+                 affected, tested, gene_indptr, gene_indices):
+        self.mutation_ids = mutation_ids
+        self.projects = projects
+        self.genes = genes
+        self.indptr = indptr
+        self.indices = indices
+        self.affected = affected
+        self.tested = tested
+        self.gene_indptr = gene_indptr
+        self.gene_indices = gene_indices
+    # ---
+
+    @classmethod
+    def from_reader(cls, reader, filters=None):
+        """Build the matrix from the mutations of the reader (an
+        ``SSM_Reader``), optionally filtered with regular expressions
+        as in ``SSM_Reader.parse``.
+        """
+        occurrence_fields = reader.subfield_parser('OCCURRENCE').subfields
+        project_pos = occurrence_fields.index('project_code')
+        affected_pos = occurrence_fields.index('affected_donors')
+        tested_pos = occurrence_fields.index('tested_donors')
+        consequence_fields = reader.subfield_parser('CONSEQUENCE').subfields
+        gene_pos = consequence_fields.index('gene_symbol')
+
+        # The IDs are padded to the same width and stored
+        # together, instead of keeping a string for each
+        mutation_ids, id_width = bytearray(), 16
+        project_index, gene_index = {}, {}
+        indptr, indices = array('q', [0]), array('i')
+        affected, tested = array('i'), array('i')
+        gene_indptr, gene_indices = array('q', [0]), array('i')
+
+        for line in reader.iter_lines(filters=filters):
+            fields = line.split('\t')
+            if len(fields) < 8:
+                # Malformed line
+                continue
+            info = dict(entry.partition('=')[::2]
+                            for entry in fields[7].split(';'))
+            mutation_id = fields[2].encode('ascii')
+            if len(mutation_id) > id_width:
+                # Widen the IDs stored so far
+                stored = np.frombuffer(mutation_ids, dtype=f'S{id_width}')
+                id_width = len(mutation_id)
+                mutation_ids = bytearray(stored.astype(f'S{id_width}').tobytes())
+            mutation_ids += mutation_id.ljust(id_width, b'\0')
+
+            for item in info.get('OCCURRENCE', '').split(','):
+                if item:
+                    values = item.split('|')
+                    project = values[project_pos]
+                    index = project_index.setdefault(project, len(project_index))
+                    indices.append(index)
+                    affected.append(int(values[affected_pos]))
+                    tested.append(int(values[tested_pos]))
+            indptr.append(len(indices))
+
+            genes = {item.split('|')[gene_pos]
+                         for item in info.get('CONSEQUENCE', '').split(',')}
+            genes.discard('')
+            for gene in genes:
+                gene_indices.append(gene_index.setdefault(gene, len(gene_index)))
+            gene_indptr.append(len(gene_indices))
+
+        return cls(
+            mutation_ids=np.frombuffer(mutation_ids, dtype=f'S{id_width}'),
+            projects=np.array(list(project_index), dtype=str),
+            genes=np.array(list(gene_index), dtype=str),
+            indptr=np.frombuffer(indptr, dtype=np.int64),
+            indices=np.frombuffer(indices, dtype=np.int32),
+            affected=np.frombuffer(affected, dtype=np.int32),
+            tested=np.frombuffer(tested, dtype=np.int32),
+            gene_indptr=np.frombuffer(gene_indptr, dtype=np.int64),
+            gene_indices=np.frombuffer(gene_indices, dtype=np.int32),
+        )
+    # ---
+
+    @property
+    def shape(self):
+        return (len(self.mutation_ids), len(self.projects))
+    # ---
+
+    def save(self, path):
+        """Store the matrix in a compressed NumPy (``.npz``) file."""
+        np.savez_compressed(path,
+                            mutation_ids=self.mutation_ids,
+                            projects=self.projects,
+                            genes=self.genes,
+                            **{name: getattr(self, name)
+                                   for name in self.ARRAYS})
+    # ---
+
+    @classmethod
+    def load(cls, path):
+        """Load a matrix stored with ``save``."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{name: data[name] for name in data.files})
+    # ---
+
+    def to_scipy(self, values='affected'):
+        """The matrix as a ``scipy.sparse.csr_matrix`` holding the
+        ``'affected'`` or ``'tested'`` donor counts.
+        """
+        from scipy.sparse import csr_matrix
+
+        return csr_matrix((getattr(self, values), self.indices, self.indptr),
+                          shape=self.shape)
+    # ---
+
+    def _rows(self):
+        """Mutation index of each entry."""
+        return np.repeat(np.arange(len(self.mutation_ids)),
+                         np.diff(self.indptr))
+    # ---
+
+    def project_index(self, project):
+        """Index of the project in the columns of the matrix."""
+        return int(np.flatnonzero(self.projects == project)[0])
+    # ---
+
+    def affected_donors(self, project=None):
+        """Number of affected donors of each mutation, in all the
+        projects or only in the given one.
+        """
+        if project is None:
+            return np.bincount(self._rows(), weights=self.affected,
+                               minlength=self.shape[0]).astype(np.int64)
+        in_project = self.indices == self.project_index(project)
+        counts = np.zeros(self.shape[0], dtype=np.int64)
+        counts[self._rows()[in_project]] = self.affected[in_project]
+        return counts
+    # ---
+
+    def recurrence_distribution(self, project=None):
+        """Number of mutations by number of affected donors, in all
+        the projects or only in the given one: the item ``k`` of the
+        array is the number of mutations affecting ``k`` donors.
+        """
+        counts = self.affected_donors(project)
+        if project is not None:
+            # Mutations absent in the project are not counted
+            counts = counts[counts > 0]
+        return np.bincount(counts)
+    # ---
+
+    def project_tested_donors(self):
+        """Number of donors tested in each project."""
+        tested = np.zeros(len(self.projects), dtype=np.int64)
+        np.maximum.at(tested, self.indices, self.tested)
+        return tested
+    # ---
+
+    def gene_project_counts(self):
+        """Sparse gene x project matrix with the number of mutations
+        and the sum of the affected donors of those mutations (a donor
+        with several mutations in the gene is counted several times).
+
+        The tested donors of each project are given by
+        ``project_tested_donors``.
+        """
+        # Pair each gene of a mutation with each of its occurrences
+        gene_rows = np.repeat(np.arange(len(self.mutation_ids)),
+                              np.diff(self.gene_indptr))
+        entries, lengths = _expand_ranges(self.indptr, gene_rows)
+        genes = np.repeat(self.gene_indices, lengths).astype(np.int64)
+        projects = self.indices[entries]
+
+        # Sum the pairs with the same gene and project
+        n_projects = len(self.projects)
+        keys, pair = np.unique(genes * n_projects + projects,
+                               return_inverse=True)
+        affected = np.bincount(pair, weights=self.affected[entries])
+
+        return GeneProjectCounts(
+            genes=self.genes,
+            projects=self.projects,
+            gene_index=(keys // n_projects).astype(np.int32),
+            project_index=(keys % n_projects).astype(np.int32),
+            affected_donors=affected.astype(np.int64),
+            mutations=np.bincount(pair),
+        )
+    # ---
+# --- OccurrenceMatrix
@@ -0,0 +1,503 @@
+"""
+Aggregators to summarize the records of a scan over the ICGC
+simple somatic mutations file.
+
+Every aggregator comes in two flavours sharing the same API: an
+exact one, whose memory grows with the number of distinct items,
+and a probabilistic sketch, whose memory is fixed beforehand at
+the cost of a bounded error:
+
+========================  ==================  ====================
+ Question                  Exact               Sketch
+========================  ==================  ====================
+ How many times?           ``ExactCounter``    ``CountMinSketch``
+ How many distinct?        ``ExactDistinct``   ``HyperLogLog``
+ Which are most common?    ``ExactCounter``    ``SpaceSaving``
+========================  ==================  ====================
+
+All of them are mergeable, so a file may be scanned in chunks
+(e.g. the parts written by ``vcf_split.py``) and the partial
+results combined afterwards with ``merge``.
+
+Example::
+
+    >>> reader = SSM_Reader(filename='data/ssm_sample.vcf')
+    >>> CONSEQUENCE = reader.subfield_parser('CONSEQUENCE')
+
+    >>> genes = top_k_counter(exact=False, k=10,
+    ...             key=lambda record: {c.gene_symbol
+    ...                                    for c in CONSEQUENCE(record)
+    ...                                    if c.gene_symbol})
+    >>> mutations = distinct_counter(exact=False,
+    ...                 key=lambda record: [record.ID])
+
+    >>> genes, mutations = reader.aggregate(genes, mutations,
+    ...                                     filters=['BRCA-EU'])
+
+    # The 3 genes most affected by the BRCA-EU mutations
+    >>> genes.most_common(3)
+
+    # The number of distinct BRCA-EU mutations
+    >>> len(mutations)
+"""
+
+import heapq
+import math
+from array import array
+from collections import Counter
+from hashlib import blake2b
+
+
+def hash64(item, seed=0):
+    """Hash an item into a 64 bit integer.
+
+    Unlike the builtin ``hash``, the result does not change between
+    interpreter runs, so sketches built in different processes can
+    be merged. Items other than ``bytes`` are hashed through their
+    string representation (so ``1`` and ``'1'`` collide).
+    """
+    if not isinstance(item, bytes):
+        item = str(item).encode('utf-8')
+    digest = blake2b(item, digest_size=8,
+                     salt=seed.to_bytes(8, 'little')).digest()
+    return int.from_bytes(digest, 'little')
+# ---
+
+
+class Aggregator:
+    """Base class of the aggregators.
+
+    Subclasses implement ``add`` and ``merge``, the rest of the
+    interface is built upon them.
+
+    The ``key`` is a function that extracts from a record the
+    iterable of items to be added, it is used by ``add_record``
+    and, through it, by ``SSM_Reader.aggregate``.
+    """
+    def __init__(self, key=None):
+        self.key = key
+    # ---
+
+    def __getstate__(self):
+        # The key function is usually a lambda, which can't be
+        # pickled, and it is not part of the aggregated data
+        state = self.__dict__.copy()
+        state['key'] = None
+        return state
+    # ---
+
+    def add(self, item, count=1):
+        """Account for ``count`` occurrences of the item."""
+        raise NotImplementedError
+    # ---
+
+    def update(self, items):
+        """Account for each of the items of the iterable."""
+        for item in items:
+            self.add(item)
+        return self
+    # ---
+
+    def add_record(self, record):
+        """Account for the items the ``key`` function extracts
+        from the record.
+        """
+        if self.key is None:
+            raise ValueError(f'{type(self).__name__} has no key function '
+                             'to extract items from the records.')
+        return self.update(self.key(record))
+    # ---
+
+    def merge(self, other):
+        """Add the contents of another aggregator of the same kind
+        to this one. Returns ``self`` to allow chaining.
+        """
+        raise NotImplementedError
+    # ---
+
+    def _check_mergeable(self, other, *params):
+        if type(self) is not type(other):
+            raise TypeError(f'Cannot merge {type(self).__name__} '
+                            f'with {type(other).__name__}.')
+        for param in params:
+            if getattr(self, param) != getattr(other, param):
+                raise ValueError(f'Cannot merge {type(self).__name__}s '
+                                 f'with different {param}.')
+    # ---
+# --- Aggregator
+
+
+class ExactCounter(Aggregator):
+    """Exact frequencies of the items, backed by a ``Counter``.
+
+    Counterpart of ``CountMinSketch`` and ``SpaceSaving``. If ``k``
+    is given, ``most_common`` gives by default the ``k`` most common
+    items, as ``SpaceSaving`` does.
+    """
+    # The estimates are exact
+    error_bound = 0
+
+    def __init__(self, k=None, key=None):
+        super().__init__(key)
+        self.k = k
+        self.counts = Counter()
+        self.total = 0
+    # ---
+
+    def add(self, item, count=1):
+        self.counts[item] += count
+        self.total += count
+    # ---
+
+    def estimate(self, item):
+        """The number of times the item has been added."""
+        return self.counts[item]
+    # ---
+
+    def __getitem__(self, item):
+        return self.estimate(item)
+    # ---
+
+    def most_common(self, n=None):
+        """List of the ``n`` (``k`` by default, all if there is no
+        ``k``) most common items and their counts.
+        """
+        if n is None:
+            n = self.k
+        return self.counts.most_common(n)
+    # ---
+
+    def merge(self, other):
+        self._check_mergeable(other)
+        self.counts.update(other.counts)
+        self.total += other.total
+        return self
+    # ---
+# --- ExactCounter
+
+
+class CountMinSketch(Aggregator):
+    """Approximate frequencies of the items in fixed memory.
+
+    The estimates never fall below the true counts and, with
+    probability ``1 - delta``, exceed them by at most
+    ``epsilon * total``. The sketch uses a table of
+    ``ceil(e / epsilon) * ceil(ln(1 / delta))`` counters
+    (about 110 KB with the defaults).
+
+    Counterpart of ``ExactCounter``.
+    """
+    def __init__(self, epsilon=0.001, delta=0.01, key=None):
+        super().__init__(key)
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.table = [array('q', bytes(8 * self.width))
+                          for _ in range(self.depth)]
+        self.total = 0
+    # ---
+
+    def _indexes(self, item):
+        # Derive the row hashes from a single one (Kirsch-Mitzenmacher)
+        hashed = hash64(item)
+        h1, h2 = hashed & 0xFFFFFFFF, (hashed >> 32) | 1
+        return [(h1 + row*h2) % self.width for row in range(self.depth)]
+    # ---
+
+    def add(self, item, count=1):
+        for row, index in zip(self.table, self._indexes(item)):
+            row[index] += count
+        self.total += count
+    # ---
+
+    def estimate(self, item):
+        """Upper bound of the number of times the item has been added."""
+        return min(row[index]
+                       for row, index in zip(self.table, self._indexes(item)))
+    # ---
+
+    def __getitem__(self, item):
+        return self.estimate(item)
+    # ---
+
+    @property
+    def error_bound(self):
+        """Maximum overestimation, holds with probability ``1 - delta``."""
+        return self.epsilon * self.total
+    # ---
+
+    def merge(self, other):
+        self._check_mergeable(other, 'width', 'depth')
+        for row, other_row in zip(self.table, other.table):
+            for index, count in enumerate(other_row):
+                if count:
+                    row[index] += count
+        self.total += other.total
+        return self
+    # ---
+# --- CountMinSketch
+
+
+class SpaceSaving(Aggregator):
+    """Approximate most common items in fixed memory (the
+    Space-Saving algorithm of Metwally et al.).
+
+    At most ``capacity`` items are monitored (``10 * k`` by default).
+    The count reported for an item exceeds its true count by at most
+    ``errors[item] <= total / capacity`` and every item whose true
+    count is above ``total / capacity`` is guaranteed to be monitored.
+
+    The least frequent item is found with a min-heap of the counts
+    whose outdated entries are discarded when they reach the top, so
+    each addition takes ``O(log capacity)`` amortized time.
+
+    Counterpart of ``ExactCounter``.
+    """
+    def __init__(self, k=10, capacity=None, key=None):
+        super().__init__(key)
+        self.k = k
+        self.capacity = capacity or 10 * k
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+        # Entries (count, sequence number, item), the
+        # number avoids comparing the items on ties
+        self._heap = []
+        self._pushed = 0
+    # ---
+
+    def _push(self, item):
+        heapq.heappush(self._heap, (self.counts[item], self._pushed, item))
+        self._pushed += 1
+        if len(self._heap) > 4 * self.capacity:
+            # Too many outdated entries
+            self._rebuild_heap()
+    # ---
+
+    def _rebuild_heap(self):
+        self._heap = [(count, n, item)
+                          for n, (item, count) in enumerate(self.counts.items())]
+        heapq.heapify(self._heap)
+        self._pushed = len(self._heap)
+    # ---
+
+    def _discard_outdated(self):
+        """Remove the outdated entries from the top of the heap."""
+        heap, counts = self._heap, self.counts
+        while heap:
+            count, _, item = heap[0]
+            if counts.get(item) == count:
+                return
+            heapq.heappop(heap)
+    # ---
+
+    def _min_count(self):
+        """The count assigned to an unmonitored item."""
+        if len(self.counts) < self.capacity:
+            return 0
+        self._discard_outdated()
+        return self._heap[0][0]
+    # ---
+
+    def add(self, item, count=1):
+        self.total += count
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+        elif len(counts) < self.capacity:
+            counts[item] = count
+            self.errors[item] = 0
+        else:
+            # Replace the least frequent item, the new
+            # one inherits its count as the error
+            self._discard_outdated()
+            floor, _, evicted = heapq.heappop(self._heap)
+            del counts[evicted]
+            del self.errors[evicted]
+            counts[item] = floor + count
+            self.errors[item] = floor
+        self._push(item)
+    # ---
+
+    def estimate(self, item):
+        """Upper bound of the number of times the item has been added."""
+        return self.counts.get(item, self._min_count())
+    # ---
+
+    def __getitem__(self, item):
+        return self.estimate(item)
+    # ---
+
+    @property
+    def error_bound(self):
+        """Maximum overestimation of any count."""
+        return self.total / self.capacity
+    # ---
+
+    def most_common(self, n=None):
+        """List of the ``n`` (``k`` by default) most common items
+        and their estimated counts.
+        """
+        if n is None:
+            n = self.k
+        ranked = sorted(self.counts.items(),
+                        key=lambda item: item[1],
+                        reverse=True)
+        return ranked[:n]
+    # ---
+
+    def merge(self, other):
+        self._check_mergeable(other, 'capacity')
+        # Unmonitored items may have appeared as many
+        # times as the least frequent monitored one
+        own_floor, other_floor = self._min_count(), other._min_count()
+
+        counts, errors = {}, {}
+        for item in self.counts.keys() | other.counts.keys():
+            counts[item] = (self.counts.get(item, own_floor)
+                            + other.counts.get(item, other_floor))
+            errors[item] = (self.errors.get(item, own_floor)
+                            + other.errors.get(item, other_floor))
+
+        kept = sorted(counts, key=counts.__getitem__, reverse=True)
+        kept = kept[:self.capacity]
+        self.counts = {item: counts[item] for item in kept}
+        self.errors = {item: errors[item] for item in kept}
+        self.total += other.total
+        self._rebuild_heap()
+        return self
+    # ---
+# --- SpaceSaving
+
+
+class ExactDistinct(Aggregator):
+    """Exact number of distinct items, backed by a ``set``.
+
+    Counterpart of ``HyperLogLog``.
+    """
+    # The cardinality is exact
+    relative_error = 0.0
+
+    def __init__(self, key=None):
+        super().__init__(key)
+        self.items = set()
+    # ---
+
+    def add(self, item, count=1):
+        self.items.add(item)
+    # ---
+
+    def cardinality(self):
+        """The number of distinct items added."""
+        return len(self.items)
+    # ---
+
+    def __len__(self):
+        return self.cardinality()
+    # ---
+
+    def merge(self, other):
+        self._check_mergeable(other)
+        self.items |= other.items
+        return self
+    # ---
+# --- ExactDistinct
+
+
+class HyperLogLog(Aggregator):
+    """Approximate number of distinct items in fixed memory.
+
+    Uses ``2**precision`` one-byte registers (16 KB with the
+    default precision of 14) and has a relative standard error
+    of ``1.04 / sqrt(2**precision)`` (0.81% with the default).
+
+    Counterpart of ``ExactDistinct``.
+    """
+    def __init__(self, precision=14, key=None):
+        super().__init__(key)
+        if not 4 <= precision <= 18:
+            raise ValueError('The precision should be between 4 and 18.')
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+    # ---
+
+    def add(self, item, count=1):
+        hashed = hash64(item)
+        # The first bits select the register, the
+        # rest give the position of the leftmost 1
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+    # ---
+
+    def cardinality(self):
+        """Estimate of the number of distinct items added."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079/m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return estimate
+    # ---
+
+    def __len__(self):
+        return round(self.cardinality())
+    # ---
+
+    @property
+    def relative_error(self):
+        """Relative standard error of the estimate."""
+        return 1.04 / math.sqrt(len(self.registers))
+    # ---
+
+    def merge(self, other):
+        self._check_mergeable(other, 'precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+    # ---
+# --- HyperLogLog
+
+
+def frequency_counter(exact=True, key=None, **params):
+    """Create an aggregator of item frequencies.
+
+    Returns an ``ExactCounter`` or, if ``exact`` is False, a
+    ``CountMinSketch`` built with the given parameters (which are
+    ignored in exact mode, so both modes can be switched freely).
+    """
+    if exact:
+        return ExactCounter(key=key)
+    return CountMinSketch(key=key, **params)
+# ---
+
+
+def distinct_counter(exact=True, key=None, **params):
+    """Create an aggregator of the number of distinct items.
+
+    Returns an ``ExactDistinct`` or, if ``exact`` is False, a
+    ``HyperLogLog`` built with the given parameters (which are
+    ignored in exact mode).
+    """
+    if exact:
+        return ExactDistinct(key=key)
+    return HyperLogLog(key=key, **params)
+# ---
+
+
+def top_k_counter(exact=True, key=None, **params):
+    """Create an aggregator of the most common items.
+
+    Returns an ``ExactCounter`` or, if ``exact`` is False, a
+    ``SpaceSaving`` summary built with the given parameters (of
+    which only ``k`` is used in exact mode).
+    """
+    if exact:
+        return ExactCounter(k=params.get('k', 10), key=key)
+    return SpaceSaving(key=key, **params)
+# ---
@@ -5,7 +5,53 @@ simple somatic mutations file.
 
 import vcf
 import re
-from collections import namedtuple
+import copy
+import hashlib
+import warnings
+from collections import namedtuple, OrderedDict
+from functools import lru_cache
+
+
+# Pattern of the subfields specification in the descriptions of the header
+SUBFIELDS_PATTERN = re.compile(r"\(subfields: (.*?)\)")
+
+# Attributes of the reader filled from the header
+HEADER_ATTRS = ('metadata', 'infos', 'filters', 'alts', 'contigs',
+                'formats', 'samples', '_sample_indexes',
+                '_header_lines', '_column_headers')
+
+# Maximum number of distinct parsed headers to keep
+HEADER_CACHE_SIZE = 64
+
+# Parsed headers by fingerprint, shared among all the readers
+# so the parts of a split file don't parse the same header again
+_header_cache = OrderedDict()
+
+
+def _copy_header(header):
+    """Copy of the header attributes, deep enough for the copy
+    to be modified without affecting the original.
+    """
+    header = dict(header)
+    header['metadata'] = copy.deepcopy(header['metadata'])
+    for attr in ('infos', 'filters', 'alts', 'contigs', 'formats'):
+        # The values are immutable namedtuples
+        header[attr] = OrderedDict(header[attr])
+    for attr in ('samples', '_header_lines', '_column_headers'):
+        header[attr] = list(header[attr])
+    header['_sample_indexes'] = dict(header['_sample_indexes'])
+    return header
+# ---
+
+
+@lru_cache(maxsize=None)
+def _subfield_struct(field_id, desc, sep):
+    """Names of the subfields of a field and the namedtuple
+    to hold them, created once per field description.
+    """
+    subfields = tuple(SUBFIELDS_PATTERN.findall(desc)[0].split(sep))
+    return subfields, namedtuple(field_id, subfields)
+# ---
 
 
 class BufferedReader:
@@ -56,11 +102,92 @@ class SSM_Reader(vcf.Reader):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
+        # Share the parsed FORMAT structures among
+        # the readers of files with the same header
+        self._format_cache = self._header_entry['format_cache']
+        
         # Add buffering 
         self.reader = BufferedReader(self.reader)
         self.re_filters = []
+        # See _first_line_fingerprint
+        self._first_line_hash = None
     # --- 
     
+    def _parse_metainfo(self):
+        """Parse the header, reusing the result of a previous
+        reader if the header is identical.
+        """
+        # Read the lines keeping track of the position in the file
+        self._offset = 0
+        self._line_offset = 0
+        self.reader = self._iter_file_lines()
+        
+        # Read the header lines (including the column names)
+        lines = []
+        line = next(self.reader)
+        while line.startswith('##'):
+            lines.append(line)
+            line = next(self.reader)
+        lines.append(line)
+        
+        # Position of the first data line
+        self._data_offset = self._offset
+        
+        fingerprint = hashlib.blake2b('\n'.join(lines).encode('utf-8'),
+                                      digest_size=16).digest()
+        key = (fingerprint, self._separator)
+        self._header_fingerprint = fingerprint.hex()
+        
+        entry = _header_cache.get(key)
+        if entry is None:
+            # Parse the header with PyVCF
+            data_lines = self.reader
+            self.reader = iter(lines)
+            super()._parse_metainfo()
+            self.reader = data_lines
+            
+            header = {attr: getattr(self, attr) for attr in HEADER_ATTRS}
+            entry = {'header': _copy_header(header), 'format_cache': {}}
+            _header_cache[key] = entry
+            if len(_header_cache) > HEADER_CACHE_SIZE:
+                _header_cache.popitem(last=False)
+        else:
+            _header_cache.move_to_end(key)
+            for attr, value in _copy_header(entry['header']).items():
+                setattr(self, attr, value)
+        
+        self._header_entry = entry
+    # ---
+    
+    def _iter_file_lines(self):
+        """Iterate through the stripped non-blank lines of the file
+        (like PyVCF does), keeping track of the position of the
+        current line in the (uncompressed) file.
+        
+        Positions are counted in characters, which for the ASCII
+        encoded ICGC file are the same as bytes.
+        """
+        for line in self._reader:
+            self._line_offset = self._offset
+            self._offset += len(line)
+            line = line.strip()
+            if line:
+                yield line
+    # ---
+    
+    def _seek(self, offset):
+        """Continue reading from the given position of the file."""
+        try:
+            self._reader.seek(offset)
+        except (AttributeError, OSError, ValueError):
+            # The file is not seekable (e.g. it is stdin),
+            # skip the lines until the position is reached
+            while self._offset < offset:
+                next(self.reader)
+        else:
+            self._offset = offset
+    # ---
+    
     def push_line(self, line):
         """Rebuffers line so that it is parsed next."""
         self.reader.push(line)
@@ -108,12 +235,9 @@ class SSM_Reader(vcf.Reader):
         # Get the field id
         field_id = sf_info.id
 
-        # Get the subfields names
-        subfields_str = re.findall("\(subfields: (.*?)\)", sf_info.desc)[0]
-        subfields = subfields_str.split(sep)
-
-        # Create the structure
-        field_struct = namedtuple(field_id, subfields)
+        # Get the subfields names and the structure
+        # (cached, as they only depend on the description)
+        subfields, field_struct = _subfield_struct(field_id, sf_info.desc, sep)
 
         # Create parser
         def parse(record):
@@ -123,7 +247,7 @@ class SSM_Reader(vcf.Reader):
                         if item]
 
         parse.field_id = sf_info.id
-        parse.subfields = subfields
+        parse.subfields = list(subfields)
         return parse
     # ---
     
@@ -144,12 +268,59 @@ class SSM_Reader(vcf.Reader):
                    # The line passes all filters
                    yield line
     # ---
+    
+    def iter_bytes(self, filters=None, columns=None):
+        """Iterate through the data lines of the file as bytes, 
+        filtering out the ones not matching the regular expressions 
+        given (as strings or bytes).
+        
+        If a list of column indexes is given, tuples with only those 
+        columns are given instead of the lines. 
+        
+        This is a faster alternative to ``iter_lines`` for scans that 
+        don't need the records, as the lines are neither decoded nor 
+        split completely (see ``ICGC_data_parser.byte_lines``). The 
+        file is read anew from the first line after the header, so 
+        the reader must have been created with a ``filename``.
+        
+        Example::
+        
+            >>> reader = SSM_Reader(filename='data/ssm_sample.vcf')
+            
+            >>> for ID, pos in reader.iter_bytes(filters=['BRCA-EU'], 
+            ...                                  columns=[2, 1]):
+            ...    print(ID, pos)
+        """
+        from .byte_lines import ByteLines
+        
+        if self.filename is None:
+            raise ValueError('The reader must be created with a filename.')
+        
+        lines = ByteLines(self.filename, start=self._data_offset)
+        if columns is None:
+            return lines.lines(filters)
+        return lines.columns(columns, filters)
+    # ---
                    
-    def parse(self, filters=None):
+    def parse(self, filters=None, checkpoint=None, quarantine=None):
         """Iterate through the records of the file, 
         filtering out the lines that do not match the 
         regular expressions given.
         
+        If a ``Checkpoint`` is given, the position in the file is
+        saved to it every ``checkpoint.every`` lines read (whether 
+        they pass the filters or not) and at the end of the scan. 
+        If the checkpoint already holds a saved state, the scan 
+        resumes from there. If that scan was finished, a warning 
+        is issued and no records are given (clear the checkpoint 
+        to scan the file again).
+        
+        If ``quarantine`` is given (a filename or an open file),
+        malformed lines are written there, preceded by their position
+        in the file and a tab, instead of raising an exception. When
+        a scan resumes, the lines written after the checkpoint was
+        saved are removed from it, so they are not written twice.
+        
         Example::
         
             >>> reader = SSM_Reader(filename='data/ssm_sample.vcf')
@@ -163,11 +334,190 @@ class SSM_Reader(vcf.Reader):
                 ...
             
         """
-        for line in self.iter_lines(filters=filters):
-            # The parser reads the record from
-            # self.reader, so, we must rebuffer 
-            # the line to parse it.
-            self.reader.push(line)
-            yield next(self)
+        if filters is None:
+            filters = []
+        
+        # Compile filters for faster lookup
+        filters = [re.compile(regex) 
+                       for regex in filters 
+                       if regex is not None]
+        
+        if isinstance(quarantine, str):
+            quarantine_file = open(quarantine, 'a')
+        else:
+            quarantine_file = quarantine
+        
+        try:
+            if checkpoint is not None:
+                first_line = self._first_line_fingerprint()
+                state = checkpoint.load()
+                if state is not None:
+                    if state['header'] != self._header_fingerprint:
+                        raise ValueError(f'The checkpoint {checkpoint.path} '
+                                         'belongs to a file with another header.')
+                    if state['first_line'] != first_line:
+                        # e.g. another part of a split file
+                        raise ValueError(f'The checkpoint {checkpoint.path} '
+                                         'belongs to another file.')
+                    checkpoint.restore(state)
+                    if state['done']:
+                        warnings.warn(f'The checkpoint {checkpoint.path} belongs '
+                                      'to a finished scan, no records are read. '
+                                      'Clear it to scan the file again.')
+                        return
+                    if (quarantine_file is not None 
+                            and state['quarantine'] is not None):
+                        # Drop the lines quarantined after the save
+                        quarantine_file.seek(state['quarantine'])
+                        quarantine_file.truncate()
+                    self.reader.buffer.clear()
+                    self._seek(state['offset'])
+                # Lines read since the last save
+                n_lines = 0
+            
+            for line in self.reader:
+                if checkpoint is not None:
+                    n_lines += 1
+                    if n_lines > checkpoint.every:
+                        # The records given so far have been 
+                        # processed, resume from the current line
+                        self._save_checkpoint(checkpoint, quarantine_file,
+                                              offset=self._line_offset)
+                        n_lines = 1
+                
+                if not all(filter_.search(line) for filter_ in filters):
+                    continue
+                
+                if quarantine_file is not None and line.count('\t') < 7:
+                    # Too few columns, divert it without
+                    # the cost of raising an exception
+                    quarantine_file.write(f'{self._line_offset}\t{line}\n')
+                    continue
+                
+                # The parser reads the record from
+                # self.reader, so, we must rebuffer 
+                # the line to parse it.
+                self.reader.push(line)
+                try:
+                    record = next(self)
+                except (IndexError, ValueError, KeyError):
+                    if quarantine_file is None:
+                        raise
+                    self.reader.buffer.clear()
+                    quarantine_file.write(f'{self._line_offset}\t{line}\n')
+                    continue
+                
+                yield record
+            
+            if checkpoint is not None:
+                self._save_checkpoint(checkpoint, quarantine_file,
+                                      offset=self._offset, done=True)
+        finally:
+            if quarantine_file is not quarantine:
+                quarantine_file.close()
+    # ---
+    
+    def _first_line_fingerprint(self):
+        """Hash of the first data line, which tells apart files with
+        the same header (like the parts of a split file).
+        
+        It is read when first needed, before any other data line.
+        """
+        if self._first_line_hash is None:
+            if self._offset != self._data_offset or self.reader.buffer:
+                raise ValueError('Checkpoints can only be used in a scan '
+                                 'from the start of the file.')
+            line = next(self.reader, '')
+            if line:
+                # Leave it to be read again
+                self.reader.push(line)
+            self._first_line_hash = hashlib.blake2b(line.encode('utf-8'),
+                                                    digest_size=16).hexdigest()
+        return self._first_line_hash
+    # ---
+    
+    def _save_checkpoint(self, checkpoint, quarantine_file, offset, 
+                         done=False):
+        """Save the state of a scan to the checkpoint."""
+        quarantine_position = None
+        if quarantine_file is not None:
+            quarantine_file.flush()
+            try:
+                quarantine_position = quarantine_file.tell()
+            except (AttributeError, OSError, ValueError):
+                # Not a regular file, it can't be truncated on resume
+                pass
+        checkpoint.save(offset=offset,
+                        header=self._header_fingerprint,
+                        first_line=self._first_line_fingerprint(),
+                        quarantine=quarantine_position,
+                        done=done)
+    # ---
+    
+    def aparse(self, filters=None, batch_size=1000, max_batches=4,
+               executor=None, **kwargs):
+        """Asynchronous iterator through the records of the file, 
+        for use in ``asyncio`` code (see ``AsyncSSM_Reader``).
+        
+        The records are read in batches of ``batch_size`` in the 
+        ``executor`` (a thread pool of the module by default), with 
+        up to ``max_batches`` read ahead. The rest of the arguments 
+        are the same as in ``parse``, except ``checkpoint``: the 
+        records are read ahead of the consumer, so the positions 
+        saved could be past records not processed yet.
+        
+        Example::
+        
+            >>> reader = SSM_Reader(filename='data/ssm_sample.vcf')
+            
+            >>> async for record in reader.aparse(filters=['BRCA-EU']):
+            ...    print(record.ID)
+            MU66865518
+            MU65487875
+                ...
+        """
+        from .async_reader import aiter_batches, _reject_checkpoint
+        
+        _reject_checkpoint(kwargs)
+        return aiter_batches(self.parse(filters=filters, **kwargs),
+                             executor=executor,
+                             batch_size=batch_size,
+                             max_batches=max_batches)
+    # ---
+    
+    def aggregate(self, *aggregators, filters=None, checkpoint=None,
+                  quarantine=None):
+        """Feed the records of the file to the given aggregators
+        (see ``ICGC_data_parser.sketches``) in a single pass.
+
+        Returns the aggregators, so the results can be unpacked
+        directly.
+        
+        The ``checkpoint`` and ``quarantine`` are passed to ``parse``,
+        the aggregators are saved in (and restored from) the checkpoint.
+
+        Example::
+
+            >>> reader = SSM_Reader(filename='data/ssm_sample.vcf')
+
+            >>> projects, = reader.aggregate(
+            ...     HyperLogLog(key=lambda record:
+            ...         [occ.split('|')[0]
+            ...             for occ in record.INFO['OCCURRENCE']])
+            ... )
+
+            # Approximate number of projects in the file
+            >>> n_projects = len(projects)
+        """
+        if checkpoint is not None:
+            checkpoint.aggregators = list(aggregators)
+        
+        records = self.parse(filters=filters, 
+                             checkpoint=checkpoint, 
+                             quarantine=quarantine)
+        for record in records:
+            for aggregator in aggregators:
+                aggregator.add_record(record)
+        return aggregators
     # ---
 # SSM_Reader
@@ -0,0 +1,66 @@
+"""
+Compare the scans of ``ByteLines`` (``SSM_Reader.iter_bytes``)
+with the same scans through ``SSM_Reader.iter_lines``.
+"""
+
+from common import (arguments, generated_file, temporary_directory,
+                    timeit, report)
+
+from ICGC_data_parser import SSM_Reader, ByteLines
+
+
+def str_columns(filename, indexes, filters):
+    """The columns of the filtered lines, with the str path."""
+    last = max(indexes)
+    for line in SSM_Reader(filename=filename).iter_lines(filters=filters):
+        fields = line.split('\t', last + 1)
+        if len(fields) > last:
+            yield tuple(fields[index] for index in indexes)
+# ---
+
+
+def main():
+    args = arguments(__doc__, mutations=200000)
+
+    scans = [
+        ('all lines', None, None),
+        ('filter BRCA-EU', ['BRCA-EU'], None),
+        ('filter TP53, BRCA-EU', ['TP53', 'BRCA-EU'], None),
+        ('filter ^X\\t', [r'^X\t'], None),
+        ('columns 0, 1', None, [0, 1]),
+        ('filter BRCA-EU, columns 2', ['BRCA-EU'], [2]),
+    ]
+
+    with temporary_directory() as directory:
+        for gzipped in (False, True):
+            filename = generated_file(directory, args.mutations, gzipped)
+            kind = 'gz' if gzipped else 'plain'
+
+            for name, filters, columns in scans:
+                if columns is None:
+                    def str_scan():
+                        reader = SSM_Reader(filename=filename)
+                        return sum(1 for _ in reader.iter_lines(filters))
+
+                    def bytes_scan():
+                        return ByteLines(filename).count(filters)
+                else:
+                    def str_scan():
+                        return sum(1 for _ in str_columns(filename, columns,
+                                                          filters))
+
+                    def bytes_scan():
+                        return sum(1 for _ in ByteLines(filename)
+                                                  .columns(columns, filters))
+
+                assert str_scan() == bytes_scan()
+                str_times = timeit(str_scan, args.repeat)
+                bytes_times = timeit(bytes_scan, args.repeat)
+                report(f'{kind}, {name}, str', str_times)
+                report(f'{kind}, {name}, bytes', bytes_times)
+                print(f'{"":<40} {str_times[0] / bytes_times[0]:.1f}x')
+# ---
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Time ``export_to_sqlite`` and the queries of ``SSM_Database``,
+against a scan of the file with ``SSM_Reader.parse``.
+"""
+
+import os
+
+from common import (arguments, generated_file, temporary_directory,
+                    timeit, report)
+
+from ICGC_data_parser import SSM_Reader, SSM_Database, export_to_sqlite
+
+
+def main():
+    args = arguments(__doc__)
+
+    with temporary_directory() as directory:
+        filename = generated_file(directory, args.mutations)
+        db_path = os.path.join(directory, 'ssm.db')
+
+        def export():
+            export_to_sqlite(SSM_Reader(filename=filename), db_path)
+
+        times = timeit(export, repeat=max(1, args.repeat // 2))
+        report('export_to_sqlite', times, unit=1, unit_name='s')
+        print(f'{"":<40} {args.mutations / times[0]:,.0f} mutations/s')
+
+        db = SSM_Database(db_path)
+
+        def scan(filters):
+            return lambda: sum(1 for _ in SSM_Reader(filename=filename)
+                                              .parse(filters=filters))
+
+        def query(method, *args, **kwargs):
+            return lambda: sum(1 for _ in method(*args, **kwargs))
+
+        report('by_gene TP53 (SQL)',
+               timeit(query(db.by_gene, 'TP53'), args.repeat))
+        report('by_gene TP53, BRCA-EU (SQL)',
+               timeit(query(db.by_gene, 'TP53', project='BRCA-EU'),
+                      args.repeat))
+        report('by_project BRCA-EU (SQL)',
+               timeit(query(db.by_project, 'BRCA-EU'), args.repeat))
+        report('in_region 2:1000-5000 (SQL)',
+               timeit(query(db.in_region, 2, 1000, 5000), args.repeat))
+        report('by_id (SQL)',
+               timeit(query(lambda: [db.by_id('MU1')]), args.repeat))
+        report('parse, filter BRCA-EU (scan)',
+               timeit(scan(['BRCA-EU']), max(1, args.repeat // 2)))
+        db.close()
+# ---
+
+
+if __name__ == '__main__':
+    main()
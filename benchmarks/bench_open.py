@@ -0,0 +1,39 @@
+"""
+Time from opening a file to getting its first record, with
+the header parsed anew and reused from the header cache.
+"""
+
+from common import (arguments, generated_file, temporary_directory,
+                    timeit, report)
+
+from ICGC_data_parser import SSM_Reader
+from ICGC_data_parser import ssm_reader
+
+
+def main():
+    args = arguments(__doc__, mutations=1000, opens=200)
+
+    with temporary_directory() as directory:
+        for gzipped in (False, True):
+            filename = generated_file(directory, args.mutations, gzipped)
+
+            def first_record(clear_cache):
+                def run():
+                    for _ in range(args.opens):
+                        if clear_cache:
+                            ssm_reader._header_cache.clear()
+                        reader = SSM_Reader(filename=filename)
+                        next(reader.parse())
+                        reader._reader.close()
+                return run
+
+            kind = 'gz' if gzipped else 'plain'
+            for name, clear_cache in [('uncached', True), ('cached', False)]:
+                best, median = timeit(first_record(clear_cache), args.repeat)
+                report(f'open to first record, {kind}, {name}',
+                       (best / args.opens, median / args.opens))
+# ---
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Helpers shared by the benchmarks.
+
+The benchmarks are plain scripts, run from the root of the
+repository, e.g.::
+
+    $ python benchmarks/bench_database.py --mutations 200000
+
+They generate a synthetic SSM file (see ``tests/synthetic.py``)
+in a temporary directory and print the timings.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'tests')]
+
+from synthetic import write_ssm_file  # noqa: E402
+
+
+def arguments(description, mutations=100000, **extra):
+    """Parse the command line options of a benchmark."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--mutations', type=int, default=mutations,
+                        help='Mutations in the generated file.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Times each measure is repeated.')
+    for name, default in extra.items():
+        parser.add_argument(f'--{name.replace("_", "-")}',
+                            type=type(default), default=default)
+    return parser.parse_args()
+# ---
+
+
+def generated_file(directory, mutations, gzipped=False):
+    """Path of a synthetic SSM file in the directory."""
+    path = os.path.join(directory,
+                        'ssm.vcf.gz' if gzipped else 'ssm.vcf')
+    if not os.path.exists(path):
+        write_ssm_file(path, mutations)
+    return path
+# ---
+
+
+def temporary_directory():
+    return tempfile.TemporaryDirectory(prefix='icgc-bench-')
+# ---
+
+
+def timeit(function, repeat=5):
+    """Best and median time of the calls to the function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+# ---
+
+
+def report(name, times, unit=1e-3, unit_name='ms'):
+    best, median = times
+    print(f'{name:<40} best {best / unit:10.3f} {unit_name}'
+          f'   median {median / unit:10.3f} {unit_name}')
+# ---
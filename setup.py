@@ -123,7 +123,7 @@ setup(
     #
     # For an analysis of "install_requires" vs pip's requirements files see:
     # https://packaging.python.org/en/latest/requirements.html
-    install_requires=['pyvcf'],  # Optional
+    install_requires=['pyvcf', 'click'],  # Optional
 
     # List additional groups of dependencies here (e.g. development
     # dependencies). Users will be able to install these using the "extras"
@@ -134,7 +134,19 @@ setup(
     # Similar to `install_requires` above, these must be valid existing
     # projects.
     extras_require={  # Optional
-        'dev': ['jupyter', 'matplotlib', 'numpy', 'seaborn', 'scipy']
+        'dev': ['jupyter', 'matplotlib', 'numpy', 'seaborn', 'scipy'],
+        'liftover': ['ensembl_rest'],
+        'matrix': ['numpy'],
+    },
+
+    # To provide executable scripts, use entry points in preference to the
+    # "scripts" keyword. Entry points provide cross-platform support and allow
+    # `pip` to create the appropriate form of executable for the target
+    # platform.
+    entry_points={  # Optional
+        'console_scripts': [
+            'icgc=ICGC_data_parser.cli:main',
+        ],
     },
 
     # List additional URLs that are relevant to your project as a dict.
@@ -0,0 +1,22 @@
+import pytest
+
+from synthetic import write_ssm_file
+
+
+N_MUTATIONS = 2000
+
+
+@pytest.fixture(scope='session')
+def ssm_file(tmp_path_factory):
+    """A plain synthetic SSM file."""
+    path = tmp_path_factory.mktemp('data') / 'ssm.vcf'
+    return str(write_ssm_file(path, N_MUTATIONS))
+# ---
+
+
+@pytest.fixture(scope='session')
+def ssm_gz_file(tmp_path_factory):
+    """The same file as ``ssm_file``, gzipped."""
+    path = tmp_path_factory.mktemp('data') / 'ssm.vcf.gz'
+    return str(write_ssm_file(path, N_MUTATIONS))
+# ---
@@ -0,0 +1,83 @@
+"""
+Generation of synthetic ICGC simple somatic mutations files,
+with the header and the INFO layout of the real ones.
+"""
+
+import gzip
+import random
+
+
+HEADER = """\
+##fileformat=VCFv4.1
+##INFO=<ID=CONSEQUENCE,Number=.,Type=String,Description="Mutation consequence predictions annotated by SnpEff (subfields: gene_symbol|gene_affected|gene_strand|transcript_name|transcript_affected|protein_affected|consequence_type|cds_mutation|aa_mutation)">
+##INFO=<ID=OCCURRENCE,Number=.,Type=String,Description="Mutation occurrence counts broken down by project (subfields: project_code|affected_donors|tested_donors|frequency)">
+##INFO=<ID=affected_donors,Number=1,Type=Integer,Description="Number of donors with the current mutation">
+##INFO=<ID=mutation,Number=1,Type=String,Description="Somatic mutation definition">
+##INFO=<ID=project_count,Number=1,Type=Integer,Description="Number of projects with the current mutation">
+##INFO=<ID=tested_donors,Number=1,Type=Integer,Description="Total number of donors with SSM data available">
+##reference=GRCh37
+##source=ICGC22
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO
+"""
+
+CHROMS = [str(n) for n in range(1, 23)] + ['X', 'Y']
+GENES = ['TP53', 'KRAS', 'PIK3CA', 'TTN', 'MUC16', 'SYNE1', 'CD1A',
+         'BRCA1', 'BRCA2', 'EGFR']
+PROJECTS = {'BRCA-EU': 532, 'PACA-CA': 315, 'ESAD-UK': 297,
+            'MELA-AU': 120, 'LIRI-JP': 555, 'EOPC-DE': 488}
+BASES = 'ACGT'
+
+
+def ssm_lines(n, seed=0):
+    """The data lines of a file with ``n`` mutations, sorted by
+    chromosome and position. A few have empty subfields.
+    """
+    rng = random.Random(seed)
+    per_chrom = -(-n // len(CHROMS))
+    mutation_ids = rng.sample(range(1, 20 * n + 1), n)
+    for i in range(n):
+        chrom = CHROMS[i // per_chrom]
+        pos = 100 + 37 * (i % per_chrom) + rng.randrange(30)
+        ref = rng.choice(BASES)
+        alt = rng.choice(BASES.replace(ref, ''))
+
+        consequences = []
+        for gene in rng.sample(GENES, rng.randint(1, 2)):
+            protein = f'p.R{rng.randrange(1, 900)}H' if rng.random() < 0.5 else ''
+            consequences.append(f'{gene}|ENSG1|+|{gene}-001|ENST1|{protein}'
+                                f'|missense_variant||')
+
+        occurrences = []
+        projects = rng.sample(sorted(PROJECTS), rng.randint(1, 3))
+        for project in projects:
+            tested = PROJECTS[project]
+            # Mostly unique mutations, as in the real data
+            affected = 1 if rng.random() < 0.8 else rng.randint(2, 6)
+            frequency = f'{affected / tested:.5f}' if rng.random() < 0.95 else ''
+            occurrences.append(f'{project}|{affected}|{tested}|{frequency}')
+        affected_donors = sum(int(item.split('|')[1]) for item in occurrences)
+
+        info = ';'.join([f'CONSEQUENCE={",".join(consequences)}',
+                         f'OCCURRENCE={",".join(occurrences)}',
+                         f'affected_donors={affected_donors}',
+                         f'mutation={ref}>{alt}',
+                         f'project_count={len(projects)}',
+                         'tested_donors=12068'])
+        yield '\t'.join([chrom, str(pos), f'MU{mutation_ids[i]}',
+                         ref, alt, '.', '.', info])
+# ---
+
+
+def write_ssm_file(path, n, seed=0, lines=None):
+    """Write a file with ``n`` synthetic mutations (or the ``lines``
+    given), gzipped if the path ends with ``.gz``.
+    """
+    if lines is None:
+        lines = ssm_lines(n, seed)
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'wt') as file:
+        file.write(HEADER)
+        for line in lines:
+            file.write(line + '\n')
+    return path
+# ---
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from contextlib import aclosing, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ICGC_data_parser import SSM_Reader, AsyncSSM_Reader, Checkpoint
+from ICGC_data_parser.async_reader import aiter_batches
+
+from synthetic import write_ssm_file
+
+
+class SlowIterator:
+    """Blocking iterator that counts the items read."""
+    def __init__(self, n, delay=0.001, fail_at=None):
+        self.n = n
+        self.delay = delay
+        self.fail_at = fail_at
+        self.read = 0
+    # ---
+
+    def __iter__(self):
+        return self
+    # ---
+
+    def __next__(self):
+        if self.read == self.fail_at:
+            raise RuntimeError('Broken input')
+        if self.read == self.n:
+            raise StopIteration
+        time.sleep(self.delay)
+        self.read += 1
+        return self.read
+    # ---
+# --- SlowIterator
+
+
+async def max_loop_lag(task, interval=0.005):
+    """Longest delay of the event loop while the task runs."""
+    lag = 0
+    while not task.done():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(lag, time.perf_counter() - start - interval)
+    await task
+    return lag
+# ---
+
+
+async def scan_ids(filename, **kwargs):
+    async with AsyncSSM_Reader(filename=filename, **kwargs) as reader:
+        return [record.ID async for record in reader.aparse()]
+# ---
+
+
+def test_loop_is_not_blocked(tmp_path):
+    filename = write_ssm_file(str(tmp_path / 'ssm.vcf'), 10000)
+
+    async def main():
+        start = time.perf_counter()
+        ids = asyncio.ensure_future(scan_ids(filename, batch_size=200))
+        lag = await max_loop_lag(ids)
+        return ids.result(), lag, time.perf_counter() - start
+
+    ids, lag, duration = asyncio.run(main())
+    assert len(ids) == 10000
+    # The loop runs while the scan takes far longer
+    assert lag < 0.1 < duration
+# ---
+
+
+@pytest.mark.parametrize('closing', [True, False])
+def test_cancel_stops_the_read_ahead(closing):
+    items = SlowIterator(10000)
+
+    async def consume():
+        batches = aiter_batches(items, batch_size=10, max_batches=2)
+        if closing:
+            batches = aclosing(batches)
+        async with batches if closing else nullcontext(batches) as records:
+            async for _ in records:
+                await asyncio.sleep(0.005)
+
+    async def main():
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        read = items.read
+        await asyncio.sleep(0.1)
+        return read
+
+    read = asyncio.run(main())
+    assert 0 < read < 100
+    if closing:
+        # The batch being read is done once the iterator is closed
+        assert items.read == read
+    else:
+        # The read ahead stops when the queue is full
+        assert items.read <= read + 3 * 10
+# ---
+
+
+def test_errors_reach_the_consumer():
+    items = SlowIterator(100, delay=0, fail_at=25)
+
+    async def main():
+        received = []
+        with pytest.raises(RuntimeError, match='Broken input'):
+            async for item in aiter_batches(items, batch_size=10):
+                received.append(item)
+        return received
+
+    assert asyncio.run(main()) == list(range(1, 21))
+# ---
+
+
+def test_parse_errors_reach_the_consumer(tmp_path):
+    filename = write_ssm_file(str(tmp_path / 'bad.vcf'), 0,
+                              lines=['1\tx\tMU1\tA\tC\t.\t.\tmutation=A>C'])
+
+    with pytest.raises(ValueError):
+        asyncio.run(scan_ids(filename))
+# ---
+
+
+def test_concurrent_scans(tmp_path):
+    filenames = [write_ssm_file(str(tmp_path / f'ssm{seed}.vcf'), 3000, seed)
+                 for seed in range(4)]
+    expected = [[record.ID for record in SSM_Reader(filename=filename).parse()]
+                for filename in filenames]
+
+    async def main(executor):
+        return await asyncio.gather(*[scan_ids(filename, batch_size=100,
+                                               executor=executor)
+                                          for filename in filenames])
+
+    # Less threads than scans, none is held between batches
+    with ThreadPoolExecutor(2) as executor:
+        assert asyncio.run(main(executor)) == expected
+# ---
+
+
+def test_close_during_scan(ssm_file):
+    async def main():
+        reader = await AsyncSSM_Reader(filename=ssm_file,
+                                       batch_size=10).open()
+        file = reader.reader._reader
+        records = reader.aparse()
+        first = [await records.__anext__() for _ in range(15)]
+
+        await reader.close()
+        assert reader.reader is None
+        assert file.closed
+
+        with pytest.raises(ValueError):
+            async for _ in records:
+                pass
+        return first
+
+    assert len(asyncio.run(main())) == 15
+# ---
+
+
+def test_checkpoints_are_rejected(ssm_file, tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'scan.ckpt'))
+
+    with pytest.raises(ValueError, match='Checkpoints are not supported'):
+        SSM_Reader(filename=ssm_file).aparse(checkpoint=checkpoint)
+
+    async def main():
+        async with AsyncSSM_Reader(filename=ssm_file) as reader:
+            async for _ in reader.aparse(checkpoint=checkpoint):
+                pass
+
+    with pytest.raises(ValueError, match='Checkpoints are not supported'):
+        asyncio.run(main())
+    # Nothing was saved
+    assert checkpoint.load() is None
+# ---
@@ -0,0 +1,127 @@
+import gzip
+
+import pytest
+
+from ICGC_data_parser import SSM_Reader, ByteLines
+
+from synthetic import HEADER, ssm_lines, write_ssm_file
+
+
+FILTERS = [
+    None,
+    ['BRCA-EU'],
+    ['TP53', 'BRCA-EU'],
+    [b'PIK3CA', 'project_count=3'],
+    [r'^X\t'],
+    [r'\tMU\d*7\t'],
+    [r'tested_donors=12068$'],
+    # Anchored patterns, searched from the newline before the line
+    [r'^1'],
+    [r'^X\t', 'BRCA-EU'],
+    [r'^X\t|BRCA-EU'],
+    [r'^(2|Y)\t\d+5\t'],
+    ['^'],
+    ['BRCA-EU', r'^1\d\t'],
+    ['NO-SUCH-PROJECT'],
+    # Constructs that see the line boundaries
+    [r'\A1\t'],
+    [r'(?<=\n)X'],
+    [r'(?<!\t)X\t'],
+    [r'12068\Z'],
+    ['BRCA-EU', r'\AX\t'],
+    [r'\AX\t', r'(?<=BRCA-)EU'],
+    # Patterns that can match across lines in a block,
+    # but never inside a single line
+    [r'12068\n1\t'],
+    [r'12068\s'],
+    [r'tested_donors=\d+[^|]*CONSEQUENCE=TP53'],
+    ['TP53', r'12068\n'],
+]
+
+COLUMNS = [[0], [2, 1], [7], [1, 0, 4, 2], [8], [20]]
+
+
+def str_lines(filename, filters):
+    filters = [regex.decode() if isinstance(regex, bytes) else regex
+               for regex in (filters or [])]
+    return list(SSM_Reader(filename=filename).iter_lines(filters=filters))
+# ---
+
+
+def str_columns(filename, indexes, filters):
+    columns = []
+    for line in str_lines(filename, filters):
+        fields = line.split('\t')
+        if len(fields) > max(indexes):
+            columns.append(tuple(fields[index].encode()
+                                 for index in indexes))
+    return columns
+# ---
+
+
+@pytest.fixture(params=['plain', 'gz', 'gz-small-blocks'])
+def byte_lines(request, ssm_file, ssm_gz_file):
+    if request.param == 'plain':
+        return ByteLines(ssm_file)
+    if request.param == 'gz':
+        return ByteLines(ssm_gz_file)
+    # Blocks that end in the middle of most lines
+    return ByteLines(ssm_gz_file, block_size=333)
+# ---
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_lines_match_iter_lines(byte_lines, filters):
+    expected = str_lines(byte_lines.filename, filters)
+
+    lines = [line.decode() for line in byte_lines.lines(filters)]
+    assert lines == expected
+    assert byte_lines.count(filters) == len(expected)
+# ---
+
+
+@pytest.mark.parametrize('filters', FILTERS[:8])
+@pytest.mark.parametrize('indexes', COLUMNS)
+def test_columns_match_iter_lines(byte_lines, indexes, filters):
+    expected = str_columns(byte_lines.filename, indexes, filters)
+    assert list(byte_lines.columns(indexes, filters)) == expected
+# ---
+
+
+@pytest.mark.parametrize('block_size', [1, 50, 4096])
+@pytest.mark.parametrize('ending', ['', '\n', '\n\n'])
+def test_odd_endings(tmp_path, block_size, ending):
+    lines = list(ssm_lines(30))
+    for suffix in ('vcf', 'vcf.gz'):
+        path = str(tmp_path / f'ssm.{suffix}')
+        write_ssm_file(path, 0, lines=lines)
+        if ending != '\n':
+            # Rewrite the end of the file
+            data = (HEADER + '\n'.join(lines) + ending).encode()
+            if suffix.endswith('gz'):
+                data = gzip.compress(data)
+            with open(path, 'wb') as file:
+                file.write(data)
+
+        byte_lines = ByteLines(path, block_size=block_size)
+        assert [line.decode() for line in byte_lines.lines()] == lines
+        for filters in (['MU'], ['^'], ['^[^#]'], ['x*']):
+            assert [line.decode()
+                    for line in byte_lines.lines(filters)] == lines
+        assert list(byte_lines.columns([2])) == \
+            [(line.split('\t')[2].encode(),) for line in lines]
+# ---
+
+
+def test_reader_iter_bytes(ssm_gz_file):
+    reader = SSM_Reader(filename=ssm_gz_file)
+    assert list(reader.iter_bytes(filters=['BRCA-EU'], columns=[2, 1])) \
+        == str_columns(ssm_gz_file, [2, 1], ['BRCA-EU'])
+# ---
+
+
+@pytest.mark.parametrize('indexes', [[], [-1], [1, -2]])
+def test_columns_needs_valid_indexes(ssm_file, indexes):
+    with pytest.raises(ValueError, match='column index'):
+        ByteLines(ssm_file).columns(indexes)
+# ---
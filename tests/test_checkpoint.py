@@ -0,0 +1,178 @@
+import io
+from collections import Counter
+
+import pytest
+
+from ICGC_data_parser import SSM_Reader, Checkpoint, ExactCounter
+
+from synthetic import ssm_lines, write_ssm_file
+from test_ssm_reader import STUDIES_HEADER
+
+
+def id_counter():
+    return ExactCounter(key=lambda record: [record.ID])
+# ---
+
+
+def interrupted_scan(filename, path, n_records, filters=None, **kwargs):
+    """Process some records of a scan and stop, as if killed."""
+    ids = id_counter()
+    checkpoint = Checkpoint(path, every=100, aggregators=[ids])
+    records = SSM_Reader(filename=filename).parse(filters=filters,
+                                                  checkpoint=checkpoint,
+                                                  **kwargs)
+    for _, record in zip(range(n_records), records):
+        ids.add_record(record)
+    records.close()
+# ---
+
+
+def resumed_scan(filename, path, filters=None, **kwargs):
+    ids = id_counter()
+    checkpoint = Checkpoint(path, every=100, aggregators=[ids])
+    for record in SSM_Reader(filename=filename).parse(filters=filters,
+                                                      checkpoint=checkpoint,
+                                                      **kwargs):
+        ids.add_record(record)
+    return ids
+# ---
+
+
+@pytest.mark.parametrize('filters', [None, ['BRCA-EU'], ['TP53', 'BRCA-EU']])
+@pytest.mark.parametrize('gzipped', [False, True])
+def test_resumed_scan_equals_full_scan(ssm_file, ssm_gz_file, tmp_path,
+                                       filters, gzipped):
+    filename = ssm_gz_file if gzipped else ssm_file
+    path = str(tmp_path / 'scan.ckpt')
+    expected = Counter(record.ID
+                       for record in SSM_Reader(filename=filename)
+                                         .parse(filters=filters))
+
+    interrupted_scan(filename, path, len(expected) // 2, filters=filters)
+    state = Checkpoint(path).load()
+    assert not state['done']
+    # Saved every 100 lines read, not records given
+    assert state['offset'] > 0
+
+    ids = resumed_scan(filename, path, filters=filters)
+    assert ids.counts == expected
+# ---
+
+
+def test_finished_scan(ssm_file, tmp_path):
+    path = str(tmp_path / 'scan.ckpt')
+    full = resumed_scan(ssm_file, path)
+    assert Checkpoint(path).load()['done']
+
+    with pytest.warns(UserWarning, match='finished scan'):
+        again = resumed_scan(ssm_file, path)
+    # Nothing read, the results are the saved ones
+    assert again.counts == full.counts
+
+    Checkpoint(path).clear()
+    assert resumed_scan(ssm_file, path).counts == full.counts
+# ---
+
+
+def test_header_mismatch(ssm_file, tmp_path):
+    path = str(tmp_path / 'scan.ckpt')
+    interrupted_scan(ssm_file, path, 500)
+
+    other = io.StringIO(STUDIES_HEADER + '\n'.join(ssm_lines(10)) + '\n')
+    records = SSM_Reader(fsock=other).parse(checkpoint=Checkpoint(path))
+    with pytest.raises(ValueError, match='another header'):
+        next(records)
+# ---
+
+
+def test_other_file_with_the_same_header(tmp_path):
+    lines = list(ssm_lines(2000))
+    part1 = write_ssm_file(str(tmp_path / 'part1.vcf'), 0, lines=lines[:1000])
+    part2 = write_ssm_file(str(tmp_path / 'part2.vcf'), 0, lines=lines[1000:])
+    path = str(tmp_path / 'scan.ckpt')
+    interrupted_scan(part1, path, 500)
+
+    records = SSM_Reader(filename=part2).parse(checkpoint=Checkpoint(path))
+    with pytest.raises(ValueError, match='another file'):
+        next(records)
+
+    # The right file still resumes
+    ids = resumed_scan(part1, path)
+    assert sum(ids.counts.values()) == 1000
+# ---
+
+
+def test_checkpoint_needs_a_scan_from_the_start(ssm_file, tmp_path):
+    reader = SSM_Reader(filename=ssm_file)
+    next(reader.parse())
+
+    records = reader.parse(checkpoint=Checkpoint(str(tmp_path / 'scan.ckpt')))
+    with pytest.raises(ValueError, match='start of the file'):
+        next(records)
+# ---
+
+
+@pytest.fixture
+def bad_lines_file(tmp_path):
+    """File with malformed lines among the good ones, and the
+    malformed lines."""
+    lines = list(ssm_lines(1000))
+    bad_lines = []
+    for i in range(50, 1000, 50):
+        fields = lines[i].split('\t')
+        if i % 100:
+            # Truncated line
+            bad = '\t'.join(fields[:4])
+        else:
+            # Position that is not a number
+            bad = '\t'.join(fields[:1] + ['x'] + fields[2:])
+        lines[i] = bad
+        bad_lines.append(bad)
+    path = write_ssm_file(str(tmp_path / 'bad.vcf'), 0, lines=lines)
+    return path, bad_lines
+# ---
+
+
+def read_quarantine(filename, quarantine):
+    with open(filename) as file:
+        data = file.read()
+    lines = []
+    with open(quarantine) as file:
+        for entry in file:
+            position, line = entry.rstrip('\n').split('\t', 1)
+            # The position is that of the line in the file
+            assert data[int(position):].startswith(line + '\n')
+            lines.append(line)
+    return lines
+# ---
+
+
+def test_quarantine(bad_lines_file, tmp_path):
+    filename, bad_lines = bad_lines_file
+    quarantine = str(tmp_path / 'bad.tsv')
+
+    records = list(SSM_Reader(filename=filename).parse(quarantine=quarantine))
+    assert len(records) == 1000 - len(bad_lines)
+    assert read_quarantine(filename, quarantine) == bad_lines
+
+    with pytest.raises(IndexError):
+        list(SSM_Reader(filename=filename).parse())
+# ---
+
+
+def test_quarantine_on_resume(bad_lines_file, tmp_path):
+    filename, bad_lines = bad_lines_file
+    quarantine = str(tmp_path / 'bad.tsv')
+    path = str(tmp_path / 'scan.ckpt')
+
+    # Stop after quarantining lines past the last save
+    interrupted_scan(filename, path, 380, quarantine=quarantine)
+    assert len(read_quarantine(filename, quarantine)) == 7
+    assert Checkpoint(path).load()['quarantine'] < \
+        len(open(quarantine).read())
+
+    ids = resumed_scan(filename, path, quarantine=quarantine)
+    assert read_quarantine(filename, quarantine) == bad_lines
+    assert sum(ids.counts.values()) == 1000 - len(bad_lines)
+    assert max(ids.counts.values()) == 1
+# ---
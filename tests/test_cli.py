@@ -0,0 +1,68 @@
+import importlib.util
+
+import pytest
+from click.testing import CliRunner
+
+from ICGC_data_parser.cli import main
+
+
+def run(*args):
+    return CliRunner().invoke(main, ['run', *args])
+# ---
+
+
+def test_parallel_run_equals_serial(ssm_file, tmp_path):
+    outputs = []
+    for jobs in ('1', '3'):
+        output = tmp_path / f'out{jobs}.vcf'
+        result = run('-i', ssm_file, '-o', str(output),
+                     '--filter', 'project=BRCA-EU', '--sample', '0.5',
+                     '--seed', '1', '--block-size', '97', '-j', jobs)
+        assert result.exit_code == 0, result.output
+        outputs.append(output.read_text())
+
+    assert outputs[0] == outputs[1]
+    assert outputs[0].count('\n') > 100
+# ---
+
+
+def test_split_lines(ssm_file, tmp_path):
+    base = str(tmp_path / 'part')
+    result = run('-i', ssm_file, '-o', base, '--split-lines', '0')
+    assert result.exit_code != 0
+    assert 'split-lines' in result.output
+
+    result = run('-i', ssm_file, '-o', base, '--split-lines', '700')
+    assert result.exit_code == 0, result.output
+    parts = sorted(tmp_path.glob('part*'))
+    assert len(parts) == 3
+# ---
+
+
+@pytest.mark.parametrize('option, value', [('--block-size', '0'),
+                                           ('--jobs', '0'),
+                                           ('--jobs', '-2')])
+def test_sizes_must_be_positive(ssm_file, option, value):
+    result = run('-i', ssm_file, option, value)
+    assert result.exit_code != 0
+    assert option in result.output
+# ---
+
+
+def test_stdin_input(ssm_file):
+    with open(ssm_file) as file:
+        data = file.read()
+    result = CliRunner().invoke(main, ['run', '--filter', 'project=BRCA-EU'],
+                                input=data)
+    assert result.exit_code == 0, result.output
+    assert 0 < result.output.count('\n') < data.count('\n')
+# ---
+
+
+@pytest.mark.skipif(importlib.util.find_spec('ensembl_rest') is not None,
+                    reason='ensembl_rest is installed')
+def test_liftover_needs_ensembl_rest(ssm_file):
+    result = run('-i', ssm_file, '--liftover', 'GRCh37:GRCh38')
+    assert result.exit_code != 0
+    assert 'ensembl_rest' in result.output
+# ---
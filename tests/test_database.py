@@ -0,0 +1,97 @@
+import pytest
+
+from ICGC_data_parser import SSM_Reader, SSM_Database, export_to_sqlite
+
+
+@pytest.fixture(scope='module')
+def database(ssm_file, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('db') / 'ssm.db')
+    export_to_sqlite(SSM_Reader(filename=ssm_file), path, batch_size=300)
+    db = SSM_Database(path)
+    yield db
+    db.close()
+# ---
+
+
+def record_summary(record):
+    return (record.CHROM, record.POS, record.ID, record.REF,
+            [str(alt) for alt in record.ALT], record.INFO)
+# ---
+
+
+def test_records_match_the_reader(ssm_file, database):
+    parsed = [record_summary(record)
+              for record in SSM_Reader(filename=ssm_file).parse()]
+    stored = [record_summary(record) for record in database.records()]
+
+    assert len(stored) == len(parsed)
+    assert stored == parsed
+# ---
+
+
+def test_queries_match_filtered_scans(ssm_file, database):
+    reader = SSM_Reader(filename=ssm_file)
+    occurrence = reader.subfield_parser('OCCURRENCE')
+    consequence = reader.subfield_parser('CONSEQUENCE')
+    records = list(reader.parse())
+
+    def ids(records):
+        return [record.ID for record in records]
+
+    expected = [record for record in records
+                if any(item.project_code == 'BRCA-EU'
+                           for item in occurrence(record))]
+    assert ids(database.by_project('BRCA-EU')) == ids(expected)
+
+    expected = [record for record in expected
+                if any(item.gene_symbol == 'TP53'
+                           for item in consequence(record))]
+    assert ids(database.by_gene('TP53', project='BRCA-EU')) == ids(expected)
+
+    expected = [record for record in records
+                if record.CHROM == '2' and 500 <= record.POS <= 2000]
+    assert ids(database.in_region(2, 500, 2000)) == ids(expected)
+
+    assert database.by_id(records[10].ID).ID == records[10].ID
+    assert database.by_id('MU0') is None
+# ---
+
+
+def test_empty_values_are_null(database):
+    for table, column in [('consequences', 'protein_affected'),
+                          ('occurrences', 'frequency')]:
+        empty, = database.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE {column} = ''"
+        ).fetchone()
+        null, = database.execute(
+            f'SELECT COUNT(*) FROM {table} WHERE {column} IS NULL'
+        ).fetchone()
+        assert empty == 0
+        assert null > 0
+# ---
+
+
+def test_failed_export_leaves_the_database(ssm_file, tmp_path):
+    path = str(tmp_path / 'ssm.db')
+    export_to_sqlite(SSM_Reader(filename=ssm_file), path)
+
+    reader = SSM_Reader(filename=ssm_file)
+    lines = reader.iter_lines
+
+    def broken_lines(filters=None):
+        for n, line in enumerate(lines(filters)):
+            if n == 1500:
+                raise OSError('Read error')
+            yield line
+
+    reader.iter_lines = broken_lines
+    with pytest.raises(OSError, match='Read error'):
+        export_to_sqlite(reader, path, batch_size=100)
+
+    # The previous load is intact, and the database is not locked
+    db = SSM_Database(path)
+    count, = db.execute('SELECT COUNT(*) FROM mutations').fetchone()
+    assert count == sum(1 for _ in SSM_Reader(filename=ssm_file).parse())
+    db.execute('CREATE TABLE notes (text TEXT)')
+    db.close()
+# ---
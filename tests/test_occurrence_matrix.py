@@ -0,0 +1,125 @@
+import os
+import subprocess
+import sys
+from collections import Counter, defaultdict
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from ICGC_data_parser import SSM_Reader, OccurrenceMatrix
+
+from synthetic import ssm_lines, write_ssm_file
+
+
+@pytest.fixture(scope='module')
+def matrix(ssm_file):
+    return OccurrenceMatrix.from_reader(SSM_Reader(filename=ssm_file))
+# ---
+
+
+def occurrences(filename):
+    """(mutation ID, [(project, affected, tested)...], genes)
+    of each record, parsed with the reader."""
+    reader = SSM_Reader(filename=filename)
+    occurrence = reader.subfield_parser('OCCURRENCE')
+    consequence = reader.subfield_parser('CONSEQUENCE')
+    for record in reader.parse():
+        yield (record.ID,
+               [(item.project_code, int(item.affected_donors),
+                 int(item.tested_donors))
+                    for item in occurrence(record)],
+               {item.gene_symbol for item in consequence(record)})
+# ---
+
+
+def test_csr_construction(ssm_file, matrix):
+    expected = list(occurrences(ssm_file))
+    projects = list(matrix.projects)
+    genes = list(matrix.genes)
+
+    assert matrix.shape == (len(expected), len(set(projects)))
+    assert list(matrix.mutation_ids.astype(str)) == [ID for ID, _, _ in expected]
+    for i, (_, items, gene_set) in enumerate(expected):
+        start, end = matrix.indptr[i], matrix.indptr[i + 1]
+        entries = [(projects[project], int(affected), int(tested))
+                   for project, affected, tested
+                       in zip(matrix.indices[start:end],
+                              matrix.affected[start:end],
+                              matrix.tested[start:end])]
+        assert entries == items
+
+        start, end = matrix.gene_indptr[i], matrix.gene_indptr[i + 1]
+        assert {genes[gene] for gene in matrix.gene_indices[start:end]} \
+            == gene_set
+# ---
+
+
+def test_long_ids_widen_the_storage(tmp_path):
+    lines = list(ssm_lines(3))
+    lines[1] = lines[1].replace('\tMU', '\tMU' + '1' * 30, 1)
+    filename = write_ssm_file(str(tmp_path / 'ssm.vcf'), 0, lines=lines)
+
+    matrix = OccurrenceMatrix.from_reader(SSM_Reader(filename=filename))
+    assert list(matrix.mutation_ids) == [line.split('\t')[2].encode()
+                                         for line in lines]
+# ---
+
+
+def test_save_and_load(matrix, tmp_path):
+    path = str(tmp_path / 'matrix.npz')
+    matrix.save(path)
+    loaded = OccurrenceMatrix.load(path)
+
+    for name in ('mutation_ids', 'projects', 'genes') + matrix.ARRAYS:
+        original, restored = getattr(matrix, name), getattr(loaded, name)
+        assert restored.dtype == original.dtype
+        assert np.array_equal(restored, original)
+# ---
+
+
+def test_recurrence_distribution(ssm_file, matrix):
+    expected = list(occurrences(ssm_file))
+
+    affected = Counter(sum(affected for _, affected, _ in items)
+                       for _, items, _ in expected)
+    distribution = matrix.recurrence_distribution()
+    assert {k: n for k, n in enumerate(distribution) if n} == dict(affected)
+    assert list(matrix.affected_donors()) == \
+        [sum(affected for _, affected, _ in items) for _, items, _ in expected]
+
+    in_project = Counter(affected
+                         for _, items, _ in expected
+                         for project, affected, _ in items
+                         if project == 'BRCA-EU')
+    distribution = matrix.recurrence_distribution('BRCA-EU')
+    assert {k: n for k, n in enumerate(distribution) if n} == dict(in_project)
+# ---
+
+
+def test_gene_project_counts(ssm_file, matrix):
+    mutations, affected = defaultdict(int), defaultdict(int)
+    for _, items, genes in occurrences(ssm_file):
+        for gene in genes:
+            for project, n_affected, _ in items:
+                mutations[gene, project] += 1
+                affected[gene, project] += n_affected
+
+    counts = matrix.gene_project_counts()
+    pairs = [(counts.genes[gene], counts.projects[project])
+             for gene, project in zip(counts.gene_index, counts.project_index)]
+    assert dict(zip(pairs, counts.mutations.tolist())) == mutations
+    assert dict(zip(pairs, counts.affected_donors.tolist())) == affected
+
+    tested = dict(zip(matrix.projects, matrix.project_tested_donors()))
+    assert tested['BRCA-EU'] == 532
+# ---
+
+
+def test_star_import_without_numpy():
+    # Hide NumPy as if it wasn't installed
+    code = ('import sys; sys.modules["numpy"] = None; '
+            'from ICGC_data_parser import *; SSM_Reader')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=root)
+# ---
@@ -0,0 +1,146 @@
+import pickle
+import random
+import time
+from collections import Counter
+
+import pytest
+
+from ICGC_data_parser.sketches import (ExactCounter, CountMinSketch,
+                                       SpaceSaving, ExactDistinct,
+                                       HyperLogLog, frequency_counter,
+                                       distinct_counter, top_k_counter)
+
+
+def zipf_items(n, seed=0):
+    """Skewed stream of items, like the mutations per gene."""
+    rng = random.Random(seed)
+    return [f'item{int(rng.paretovariate(1.1))}' for _ in range(n)]
+# ---
+
+
+def test_count_min_never_underestimates_and_respects_bound():
+    items = zipf_items(50000)
+    truth = Counter(items)
+    sketch = CountMinSketch(epsilon=0.001, delta=0.01).update(items)
+
+    assert sketch.total == len(items)
+    for item, count in truth.items():
+        estimate = sketch[item]
+        assert estimate >= count
+        assert estimate - count <= sketch.error_bound
+# ---
+
+
+def test_count_min_merge_equals_single_pass():
+    items = zipf_items(20000)
+    whole = CountMinSketch().update(items)
+    merged = CountMinSketch().update(items[:7000])
+    merged.merge(CountMinSketch().update(items[7000:]))
+
+    assert merged.table == whole.table
+    assert merged.total == whole.total
+# ---
+
+
+def test_space_saving_bounds():
+    items = zipf_items(50000)
+    truth = Counter(items)
+    summary = SpaceSaving(k=10, capacity=100).update(items)
+
+    for item, count in summary.counts.items():
+        assert truth[item] <= count <= truth[item] + summary.errors[item]
+        assert summary.errors[item] <= summary.error_bound
+    # Every frequent enough item is monitored
+    for item, count in truth.items():
+        if count > summary.error_bound:
+            assert item in summary.counts
+    assert ([item for item, _ in summary.most_common(5)]
+            == [item for item, _ in truth.most_common(5)])
+# ---
+
+
+def test_space_saving_merge():
+    items = zipf_items(60000, seed=1)
+    truth = Counter(items)
+    merged = SpaceSaving(k=10, capacity=200).update(items[:20000])
+    merged.merge(SpaceSaving(k=10, capacity=200).update(items[20000:]))
+
+    assert merged.total == len(items)
+    assert len(merged.counts) <= merged.capacity
+    for item, count in merged.counts.items():
+        assert truth[item] <= count <= truth[item] + merged.errors[item]
+        assert merged.errors[item] <= merged.error_bound
+    assert ([item for item, _ in merged.most_common(5)]
+            == [item for item, _ in truth.most_common(5)])
+
+    # The merged summary keeps working
+    merged.update(items[:1000])
+    assert merged.total == len(items) + 1000
+# ---
+
+
+def test_space_saving_is_fast_on_high_cardinality():
+    items = [f'item{i}' for i in range(200000)]
+    start = time.perf_counter()
+    SpaceSaving(capacity=1000).update(items)
+    assert time.perf_counter() - start < 3
+# ---
+
+
+def test_hyperloglog_error():
+    sketch = HyperLogLog(precision=12)
+    sketch.update(range(100000))
+    error = abs(sketch.cardinality() - 100000) / 100000
+    assert error < 4 * sketch.relative_error
+
+    small = HyperLogLog().update(['a', 'b', 'c', 'a'])
+    assert len(small) == 3
+# ---
+
+
+def test_hyperloglog_merge_is_union():
+    left = HyperLogLog().update(range(0, 60000))
+    right = HyperLogLog().update(range(30000, 90000))
+    union = HyperLogLog().update(range(0, 90000))
+
+    assert left.merge(right).registers == union.registers
+# ---
+
+
+def test_merge_rejects_other_kinds_and_parameters():
+    with pytest.raises(TypeError):
+        ExactCounter().merge(SpaceSaving())
+    with pytest.raises(ValueError):
+        HyperLogLog(precision=10).merge(HyperLogLog(precision=12))
+# ---
+
+
+@pytest.mark.parametrize('exact', [True, False])
+def test_exact_and_sketched_modes_share_the_api(exact):
+    items = zipf_items(5000)
+    truth = Counter(items)
+
+    counter = frequency_counter(exact=exact, key=lambda record: record)
+    counter.add_record(items)
+    assert counter['item1'] >= truth['item1']
+    assert counter['item1'] - truth['item1'] <= counter.error_bound
+
+    top = top_k_counter(exact=exact, k=3).update(items)
+    assert len(top.most_common()) == 3
+    assert top.most_common()[0][0] == truth.most_common(1)[0][0]
+
+    distinct = distinct_counter(exact=exact).update(items)
+    assert isinstance(distinct, ExactDistinct if exact else HyperLogLog)
+    assert (abs(len(distinct) - len(truth))
+            <= 4 * distinct.relative_error * len(truth))
+# ---
+
+
+def test_aggregators_pickle_without_key():
+    counter = ExactCounter(key=lambda record: [record])
+    counter.add('a')
+    restored = pickle.loads(pickle.dumps(counter))
+
+    assert restored.key is None
+    assert restored['a'] == 1
+# ---
@@ -0,0 +1,51 @@
+import io
+
+from ICGC_data_parser import SSM_Reader
+from ICGC_data_parser import ssm_reader
+
+from synthetic import HEADER, ssm_lines
+
+
+# Header with the malformed type of the studies subfield
+STUDIES_HEADER = HEADER.replace(
+    '##reference',
+    '##INFO=<ID=studies,Number=.,Type=Float,'
+    'Description="Studies the donor is involved in">\n##reference'
+)
+
+
+def studies_file(seed=0):
+    lines = [line + ';studies=PCAWG' for line in ssm_lines(5, seed)]
+    return io.StringIO(STUDIES_HEADER + '\n'.join(lines) + '\n')
+# ---
+
+
+def test_header_is_cached():
+    first = SSM_Reader(fsock=studies_file())
+    second = SSM_Reader(fsock=studies_file(seed=1))
+
+    assert first._header_fingerprint == second._header_fingerprint
+    assert first._header_entry is second._header_entry
+    assert first.infos == second.infos
+    assert first.infos is not second.infos
+# ---
+
+
+def test_changes_to_infos_dont_leak_into_the_cache():
+    ssm_reader._header_cache.clear()
+
+    # The reader that parses the header and the one that reuses it
+    for _ in range(2):
+        reader = SSM_Reader(fsock=studies_file())
+        # Fix of the studies type, see the README
+        reader.infos['studies'] = reader.infos['studies']._replace(type='String')
+        reader.metadata['reference'] = 'GRCh38'
+        reader.infos.pop('mutation')
+
+        assert reader.infos['studies'].type == 'String'
+
+        other = SSM_Reader(fsock=studies_file())
+        assert other.infos['studies'].type == 'Float'
+        assert 'mutation' in other.infos
+        assert other.metadata['reference'] == 'GRCh37'
+# ---